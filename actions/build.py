@@ -11,34 +11,54 @@ Can do the following actions:
 
 import argparse
 import inspect
+import subprocess
 import sys
-import uvicorn
-from configuration.tree_walker import TreeRenderer
-from configuration.container import ServerContainer
-from services.httpd_service import (
-    LATEST_IMAGE,
-    DEFAULT_CONTAINER_NAME,
-    GIT_REPO_VOLUME,
-    GIT_TEST_REPO,
-    WEBDAV_VOLUME,
-)
-from http_server.health_check import healthcheck
-from actions.shell import ipython_shell
-
-
-container = ServerContainer()
-config_service = container.config_service()
-config_service.load_yaml_config("secrets/config.yaml")
-podman_service = container.podman_service()
-httpd_service = container.httpd_service()
-user_service = container.user_service()
+from functools import lru_cache
+
+# Dependencies are imported by the actions that use them and services are created
+# on first use, so that --help and list_functions start quickly.
+
+CONFIG_PATH = "secrets/config.yaml"
+
+
+@lru_cache(maxsize=None)
+def _config_service():
+    """The configuration service, loaded from secrets/config.yaml"""
+    from services.config_service import create_config_service
+
+    config_service = create_config_service()
+    config_service.load_yaml_config(CONFIG_PATH)
+    return config_service
+
+
+@lru_cache(maxsize=None)
+def _container():
+    """The service container, sharing the configuration service of the actions"""
+    from dependency_injector import providers
+    from configuration.container import ServerContainer
+
+    container = ServerContainer()
+    container.config_service.override(providers.Object(_config_service()))
+    return container
+
+
+def _podman_service():
+    return _container().podman_service()
+
+
+def _httpd_service():
+    return _container().httpd_service()
+
+
+def _user_service():
+    return _container().user_service()
 
 
 def list_containers():
     """
     List all containers
     """
-    containers = podman_service.list_containers()
+    containers = _podman_service().list_containers()
     for podman_container in containers:
         print(f'{podman_container.name} {podman_container.attrs["State"]}')
     return containers
@@ -46,17 +66,58 @@ def list_containers():
 
 def render():
     """
-    Render the configuration tree into a build directory
+    Render the configuration tree into a build directory, skipping unchanged nodes
     """
-    walker = TreeRenderer()
-    walker.walk(config_service.config.build_paths, config_service.config)
+    from configuration.tree_walker import IncrementalTreeRenderer
+
+    config = _config_service().config
+    walker = IncrementalTreeRenderer()
+    walker.walk(config.build_paths, config)
+
+
+def plan():
+    """
+    Print the changes a render would make to the build directory, without making them
+    """
+    from configuration.tree_plan import RenderPlanner
+
+    config = _config_service().config
+    render_plan = RenderPlanner().plan(config.build_paths, config)
+    print(render_plan)
+    return render_plan
+
+
+def parallel_render():
+    """
+    Render the configuration tree using all cores, skipping unchanged nodes
+    """
+    from configuration.tree_walker import ParallelTreeRenderer
+
+    config = _config_service().config
+    walker = ParallelTreeRenderer()
+    walker.walk(config.build_paths, config)
+
+
+def precompile_templates():
+    """
+    Compile the templates into python modules at build.compiled_template_root
+    """
+    from configuration.templates import precompile_templates as compile_templates
+
+    build_context = _config_service().config.build
+    if build_context.compiled_template_root is None:
+        print("Set build.compiled_template_root in secrets/config.yaml first")
+        return
+    compile_templates(build_context.template_root, build_context.compiled_template_root)
 
 
 def build_image():
     """
     Build the image using the configuration found in secrets/config.yaml
     """
-    image_id, build_output = httpd_service.build_image(LATEST_IMAGE)
+    from services.httpd_service import LATEST_IMAGE
+
+    image_id, build_output = _httpd_service().build_image(LATEST_IMAGE)
     assert image_id is not None
     for line in build_output:
         print(line)
@@ -74,6 +135,9 @@ def run_container():
     """
     Run the container using the image built in the build step
     """
+    from services.httpd_service import LATEST_IMAGE, DEFAULT_CONTAINER_NAME
+
+    httpd_service = _httpd_service()
     httpd_container = httpd_service.run_container(LATEST_IMAGE, DEFAULT_CONTAINER_NAME)
     assert httpd_container is not None
     assert httpd_service.is_container_running(httpd_container.id)
@@ -83,7 +147,9 @@ def health():
     """
     Check the health of the container
     """
-    domain = config_service.config.admin.domain
+    from http_server.health_check import healthcheck
+
+    domain = _config_service().config.admin.domain
     assert healthcheck(domain)
 
 
@@ -91,9 +157,9 @@ def certificates():
     """
     Get certificates from Let's Encrypt
     """
-    certbot = container.certbot_service()
+    certbot = _container().certbot_service()
     success = certbot.create_certificate(
-        config_service.config.admin.domain, dry_run=False, staging=False
+        _config_service().config.admin.domain, dry_run=False, staging=False
     )
     assert success is True
 
@@ -102,44 +168,65 @@ def reload_httpd():
     """
     Reload the http server configuration
     """
+    from services.httpd_service import DEFAULT_CONTAINER_NAME
+
+    httpd_service = _httpd_service()
     container_id = httpd_service.get_container_id(DEFAULT_CONTAINER_NAME)
     assert container_id is not None
     httpd_service.reload_configuration(container_id)
     assert httpd_service.is_container_running(container_id)
 
 
+def watch():
+    """
+    Watch templates and secrets/config.yaml, re-rendering and reloading on change
+    """
+    _container().watch_service().run()
+
+
 def create_git_repo_volume():
     """
     Create a git repo volume
     """
-    httpd_service.create_repo_volume(GIT_REPO_VOLUME)
+    from services.httpd_service import GIT_REPO_VOLUME
+
+    _httpd_service().create_repo_volume(GIT_REPO_VOLUME)
 
 
 def remove_git_repo_volume():
     """
     Remove the git repo volume
     """
-    httpd_service.remove_repo_volume(GIT_REPO_VOLUME)
+    from services.httpd_service import GIT_REPO_VOLUME
+
+    _httpd_service().remove_repo_volume(GIT_REPO_VOLUME)
 
 
 def create_webdav_volume():
     """
     Create a webdav volume
     """
-    httpd_service.create_repo_volume(WEBDAV_VOLUME)
+    from services.httpd_service import WEBDAV_VOLUME
+
+    _httpd_service().create_repo_volume(WEBDAV_VOLUME)
 
 
 def remove_webdav_volume():
     """
     Remove the webdav volume
     """
-    httpd_service.remove_repo_volume(WEBDAV_VOLUME)
+    from services.httpd_service import WEBDAV_VOLUME
+
+    _httpd_service().remove_repo_volume(WEBDAV_VOLUME)
 
 
 def create_test_repo():
     """
     Create a test git repo
     """
+    from services.httpd_service import DEFAULT_CONTAINER_NAME, GIT_TEST_REPO
+
+    httpd_service = _httpd_service()
     container_id = httpd_service.get_container_id(DEFAULT_CONTAINER_NAME)
     assert container_id is not None
     httpd_service.create_git_repo(container_id, GIT_TEST_REPO)
@@ -149,11 +236,14 @@ def reload():
     """
     Reload the configuration
     """
-    certbot = container.certbot_service()
+    from services.httpd_service import DEFAULT_CONTAINER_NAME
+
+    certbot = _container().certbot_service()
     success = certbot.update_apache_configs_to_letsencrypt(
-        config_service.config.admin.domain
+        _config_service().config.admin.domain
     )
     assert success
+    httpd_service = _httpd_service()
     container_id = httpd_service.get_container_id(DEFAULT_CONTAINER_NAME)
     assert container_id is not None
     httpd_service.reload_configuration(container_id)
@@ -164,6 +254,9 @@ def rm_container():
     """
     Remove the container
     """
+    from services.httpd_service import DEFAULT_CONTAINER_NAME
+
+    httpd_service = _httpd_service()
     container_id = httpd_service.get_container_id(DEFAULT_CONTAINER_NAME)
     assert container_id is not None
     if httpd_service.is_container_running(container_id):
@@ -177,6 +270,9 @@ def rm_image():
     """
     Remove the image
     """
+    from services.httpd_service import LATEST_IMAGE
+
+    httpd_service = _httpd_service()
     image = LATEST_IMAGE
     httpd_service.remove_image(image)
     assert httpd_service.get_image_id(image) is None
@@ -186,7 +282,7 @@ def git_password():
     """
     Generate a new password
     """
-    password = user_service.random_password("git")
+    password = _user_service().random_password("git")
     print(password)
     return password
 
@@ -195,6 +291,8 @@ def run_ops():
     """
     Run the operations http server.
     """
+    import uvicorn
+
     uvicorn.run(
         "web.home:app",
         host="127.0.0.1",
@@ -209,9 +307,34 @@ def run_shell():
     """
     Run an IPython shell
     """
+    from actions.shell import ipython_shell
+
     ipython_shell()
 
 
+def import_report():
+    """
+    Print the slowest imports made when loading this module and running list_functions
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "list_functions"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times.append((int(cumulative), name[1:].rstrip()))
+    total = sum(cumulative for cumulative, name in times if not name.startswith(" "))
+    print(f"Total import time: {total / 1000:.1f} ms")
+    for cumulative, name in sorted(times, reverse=True)[:20]:
+        print(f"{cumulative / 1000:8.1f} ms {name}")
+    return times
+
+
 def list_functions():
     """
     Introspect the available functions defined in this file and print them to the console
@@ -220,7 +343,7 @@ def list_functions():
     functions = inspect.getmembers(current_module, inspect.isfunction)
     function_list = []
     for name, func in functions:
-        if func.__module__ == current_module.__name__:
+        if func.__module__ == current_module.__name__ and not name.startswith("_"):
             function_list.append(name)
     return function_list
 
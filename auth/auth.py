@@ -6,8 +6,10 @@ It can generate random passwords, store them in a file, and check if a given pas
 import os
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List
-from passlib.apache import HtpasswdFile
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    from passlib.apache import HtpasswdFile
 
 
 @dataclass
@@ -35,6 +37,8 @@ def to_htpasswd_file(users: List[UserCredential], file_path):
         file_path (str): The file path to write to.
     """
     # Test if file exists
+    from passlib.apache import HtpasswdFile
+
     ensure_file_path(file_path)
     ht = HtpasswdFile(file_path, new=not os.path.exists(file_path))
     for user in users:
@@ -52,6 +56,8 @@ def from_htpasswd_file(file_path):
     Returns:
         str: The htpasswd file content.
     """
+    from passlib.apache import HtpasswdFile
+
     ht = HtpasswdFile(file_path)
     return ht
 
@@ -66,6 +72,8 @@ def from_htpasswd_str(htpasswd_str):
     Returns:
         HtpasswdFile: The HtpasswdFile object.
     """
+    from passlib.apache import HtpasswdFile
+
     ht = HtpasswdFile()
     ht.load_string(htpasswd_str)
     return ht
@@ -82,6 +90,8 @@ def to_htpasswd_str(user: UserCredential) -> str:
     Returns:
         str: The htpasswd entry.
     """
+    from passlib.apache import HtpasswdFile
+
     ht = HtpasswdFile()
     ht.set_password(user.username, user.password)
     return ht.to_string().decode("utf-8")
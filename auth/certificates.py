@@ -4,13 +4,7 @@ This module contains functions for generating and managing SSL certificates.
 
 import logging
 import time
-from cryptography import x509
-from cryptography.x509.oid import NameOID
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
 from datetime import datetime, timedelta, timezone
-from certbot import main as certbot_main
-from http_server.health_check import healthcheck
 import os
 
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +22,12 @@ def generate_self_signed_cert(
     """
     Generate a self-signed certificate for the given domain.
     """
+    # Imported here since certificates are rarely regenerated
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
     key = rsa.generate_private_key(
         public_exponent=65537,
         key_size=2048,
@@ -78,6 +78,9 @@ def generate_self_signed_cert(
 
 def wait_for_webserver(domain):
     """Wait for the web server to be ready"""
+    # Imported here so loading this module does not pull in requests
+    from http_server.health_check import healthcheck
+
     max_attempts = 30
     attempt = 0
 
@@ -147,6 +150,9 @@ def certbot_ssl(
             logger.info("Would have run: certbot %s", " ".join(args))
             return True
 
+        # certbot is slow to import and only needed here
+        from certbot import main as certbot_main
+
         certbot_main.main(args)
 
         # Update Apache configuration
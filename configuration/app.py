@@ -3,9 +3,12 @@ This module contains the configuration classes for the server.
 """
 
 import os
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set
 from pydantic import BaseModel, Field
 
+from configuration.config_diff import is_under, join_path
+from configuration.templates import referenced_names
+from configuration.tracking import track
 from configuration.tree_nodes import FSTree, AdminContext, container_paths, build_tree
 
 # Create an absolute workspace directory variable
@@ -49,6 +52,8 @@ class BuildContext(BaseModel):
 
     build_root: str = "."
     template_root: str = "templates"
+    # Output of the precompile_templates action, used in place of template sources
+    compiled_template_root: Optional[str] = None
 
 
 class ImapConfig(BaseModel):
@@ -96,9 +101,94 @@ class Config(BaseModel):
     def to_kwargs(self) -> dict:
         """Convert the configuration to a dictionary"""
 
-        kwargs = {
-            **self.admin.model_dump(),
-            **self.build.model_dump(),
-            **self.model_dump(),
-        }
-        return kwargs
+        return dict(RenderContext(self))
+
+    def render_context(self) -> "RenderContext":
+        """A lazily evaluated view of to_kwargs for rendering templates"""
+        return RenderContext(self)
+
+
+class RenderContext(Mapping[str, Any]):
+    """
+    A read-only mapping with the same keys and values as Config.to_kwargs. Each
+    value is dumped from the configuration the first time it is read, so one
+    RenderContext can be shared by every template in a walk, and the FSTrees are
+    only dumped if a template actually references them.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        # Later sources win, matching the merge order of to_kwargs
+        self._sources: Dict[str, BaseModel] = {}
+        self._paths: Dict[str, str] = {}
+        for model, prefix in ((config.admin, "admin"), (config.build, "build")):
+            for name in type(model).model_fields:
+                self._sources[name] = model
+                self._paths[name] = join_path(prefix, name)
+        for name in type(config).model_fields:
+            self._sources[name] = config
+            self._paths[name] = name
+        self._values: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        model = self._sources[name]
+        value = model.model_dump(include={name})[name]
+        self._values[name] = value
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sources)
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def select(self, names: Iterable[str]) -> Dict[str, Any]:
+        """The values for names, always including the build settings that
+        TemplateTree.render takes as arguments"""
+        selected = {name: self[name] for name in type(self.config.build).model_fields}
+        for name in names:
+            if name in self._sources:
+                selected[name] = self[name]
+        return selected
+
+    def config_path(self, name: str) -> str:
+        """The configuration path a context name is read from, e.g. admin.email"""
+        return self._paths[name]
+
+    def referenced_names(self, template_path: str) -> Set[str]:
+        """The context names a template and the templates it pulls in read"""
+        build = self.config.build
+        template_root = build.template_root or build.build_root
+        return referenced_names(template_root, template_path) & self._sources.keys()
+
+    def for_template(
+        self, template_path: str, reads: Optional[Set[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        The slice of the context a template and the templates it pulls in read.
+        If reads is given, the configuration paths read from dicts and lists in
+        the slice are added to it while the template renders.
+        """
+        names = self.referenced_names(template_path)
+        selected = self.select(names)
+        if reads is not None:
+            for name in names:
+                selected[name] = track(selected[name], self.config_path(name), reads)
+        return selected
+
+    def dependencies(self, template_path: str, reads: Set[str]) -> Set[str]:
+        """
+        The configuration paths a render of template_path depends on, given the
+        reads recorded by for_template. Names whose reads were not observed, such
+        as strings and numbers, count as dependencies as a whole.
+        """
+        dependencies = set(reads)
+        for name in self.referenced_names(template_path):
+            path = self.config_path(name)
+            if not any(is_under(read, path) for read in reads):
+                dependencies.add(path)
+        return dependencies
@@ -0,0 +1,64 @@
+"""
+Path-level differences between two configuration snapshots.
+
+Paths name fields with dots and list items with indexes, for example
+admin.domain or proxies[3].backend.
+"""
+
+from typing import Any, Set
+from pydantic import BaseModel
+
+
+def join_path(prefix: str, name: str) -> str:
+    """Append a field name to a path"""
+    return f"{prefix}.{name}" if prefix else name
+
+
+def is_under(path: str, prefix: str) -> bool:
+    """Whether path is prefix itself or one of the fields or items below it"""
+    if not prefix or path == prefix:
+        return True
+    return path.startswith(prefix) and path[len(prefix)] in ".["
+
+
+def diff_config(old: Any, new: Any, prefix: str = "") -> Set[str]:
+    """
+    Return the paths of every value that differs between old and new. Models that
+    are shared between the two, as unchanged parts of copy-on-write snapshots are,
+    are skipped without being compared. Excluded fields, such as the parent links
+    of tree nodes, are not compared.
+    """
+    if old is new:
+        return set()
+
+    if isinstance(old, BaseModel) and type(old) is type(new):
+        changed = set()
+        for name, field in type(old).model_fields.items():
+            if field.exclude:
+                continue
+            changed |= diff_config(
+                getattr(old, name), getattr(new, name), join_path(prefix, name)
+            )
+        return changed
+
+    if isinstance(old, list) and isinstance(new, list):
+        changed = set()
+        for index in range(max(len(old), len(new))):
+            path = f"{prefix}[{index}]"
+            if index >= len(old) or index >= len(new):
+                changed.add(path)
+            else:
+                changed |= diff_config(old[index], new[index], path)
+        return changed
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = set()
+        for key in old.keys() | new.keys():
+            path = join_path(prefix, str(key))
+            if key not in old or key not in new:
+                changed.add(path)
+            else:
+                changed |= diff_config(old[key], new[key], path)
+        return changed
+
+    return set() if old == new else {prefix}
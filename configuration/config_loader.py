@@ -1,8 +1,9 @@
-import yaml
 import os
 from pathlib import Path
 import argparse
 
+from configuration.yaml_cache import cached_load
+
 
 class ConfigurationLoader:
 
@@ -10,8 +11,7 @@ class ConfigurationLoader:
     def load_yaml(config_path: str) -> dict:
         if not config_path or not Path(config_path).exists():
             return {}
-        with open(config_path, "r") as f:
-            return yaml.safe_load(f) or {}
+        return cached_load(config_path, "yaml") or {}
 
     @staticmethod
     def load_env() -> dict:
@@ -1,25 +1,32 @@
 """
 This module provides a services for testing and application use.
+
+Services with heavy dependencies (podman, GitPython, FastAPI, ...) are created by
+factory functions that import them on first use, so importing the container
+does not import every dependency of every service.
 """
 
-from typing import List
+from typing import TYPE_CHECKING, List
 from dependency_injector import containers, providers
-from fastapi import FastAPI
-from configuration.tree_nodes import AdminContext
-from configuration.app import PodmanConfig, Config
+from configuration.app import PodmanConfig
 from configuration.app import ImapConfig
 from configuration.app import SmtpConfig
-from services.podman_service import PodmanService
-from services.config_service import ConfigService
-from services.httpd_service import HttpdService
-from services.certbot_service import CertbotService
-from services.git_service import GitService
+from services.config_service import ConfigService, create_config_service
 from services.user_service import UserService
-from web.config_api import ConfigAPI
-from web.fastapi_provider import AppProvider, RouteProvider
 from mail.imap import ImapService
 from mail.smtp import SmtpService
 
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+    from services.certbot_service import CertbotService
+    from services.git_service import GitService
+    from services.httpd_service import HttpdService
+    from services.podman_service import PodmanService
+    from services.watch_service import WatchService
+    from web.config_api import ConfigAPI
+    from web.fastapi_provider import AppProvider, RouteProvider
+    from web.ws_hub import WebSocketHub
+
 
 def create_imap_service(config_service: ConfigService) -> ImapService:
     """
@@ -49,25 +56,90 @@ def to_podman_config(config_service: ConfigService) -> PodmanConfig:
     return config_service.config.podman
 
 
-def create_config_service() -> ConfigService:
+def create_podman_service(podman_config: PodmanConfig) -> "PodmanService":
+    """
+    Creates a PodmanService object.
+    """
+    from services.podman_service import PodmanService
+
+    return PodmanService(podman_config=podman_config)
+
+
+def create_httpd_service(
+    podman_service: "PodmanService", config_service: ConfigService
+) -> "HttpdService":
+    """
+    Creates a HttpdService object.
+    """
+    from services.httpd_service import HttpdService
+
+    return HttpdService(podman_service=podman_service, config_service=config_service)
+
+
+def create_certbot_service(config_service: ConfigService) -> "CertbotService":
+    """
+    Creates a CertbotService object.
+    """
+    from services.certbot_service import CertbotService
+
+    return CertbotService(config_service=config_service)
+
+
+def create_git_service(config_service: ConfigService) -> "GitService":
+    """
+    Creates a GitService object.
+    """
+    from services.git_service import GitService
+
+    return GitService(config_service=config_service)
+
+
+def create_ws_hub() -> "WebSocketHub":
     """
-    Creates a ConfigService object.
+    Creates the hub that pushes server events to websocket clients.
     """
+    from web.ws_hub import WebSocketHub
 
-    config = Config(
-        admin=AdminContext(
-            domain="example.com",
-            email="admin@example.com",
-        )
+    return WebSocketHub()
+
+
+def create_watch_service(
+    config_service: ConfigService, httpd_service: "HttpdService", hub: "WebSocketHub"
+) -> "WatchService":
+    """
+    Creates a WatchService object.
+    """
+    from services.watch_service import WatchService
+
+    return WatchService(
+        config_service=config_service, httpd_service=httpd_service, hub=hub
     )
 
-    return ConfigService(config=config)
+
+def create_config_api(config_service: ConfigService) -> "ConfigAPI":
+    """
+    Creates a ConfigAPI route provider.
+    """
+    from web.config_api import ConfigAPI
+
+    return ConfigAPI(config_service=config_service)
 
 
-def create_openapi_service(routers: List[RouteProvider]) -> FastAPI:
+def create_app_provider(route_providers: List["RouteProvider"]) -> "AppProvider":
+    """
+    Creates an AppProvider for the given route providers.
+    """
+    from web.fastapi_provider import AppProvider
+
+    return AppProvider(route_providers=route_providers)
+
+
+def create_openapi_service(routers: List["RouteProvider"]) -> "FastAPI":
     """
     Creates a FastAPI application with a configuration object
     """
+    from fastapi import FastAPI
+
     app = FastAPI(title="Configurable API")
 
     for router in routers:
@@ -91,22 +163,39 @@ class ServerContainer(containers.DeclarativeContainer):
 
     smtp_config = providers.Factory(to_smtp_config, config_service=config_service)
 
-    podman_service = providers.Factory(PodmanService, podman_config=podman_config)
+    podman_service = providers.Factory(
+        create_podman_service, podman_config=podman_config
+    )
 
     imap_service = providers.Singleton(ImapService, imap_config=imap_config)
 
     smtp_service = providers.Singleton(SmtpService, smtp_config=smtp_config)
 
     httpd_service = providers.Singleton(
-        HttpdService, podman_service=podman_service, config_service=config_service
+        create_httpd_service,
+        podman_service=podman_service,
+        config_service=config_service,
     )
 
-    certbot_service = providers.Singleton(CertbotService, config_service=config_service)
+    certbot_service = providers.Singleton(
+        create_certbot_service, config_service=config_service
+    )
 
-    git_service = providers.Singleton(GitService, config_service=config_service)
+    git_service = providers.Singleton(create_git_service, config_service=config_service)
 
     user_service = providers.Singleton(UserService, config_service=config_service)
 
-    config_api = providers.Singleton(ConfigAPI, config_service=config_service)
+    ws_hub = providers.Singleton(create_ws_hub)
+
+    watch_service = providers.Singleton(
+        create_watch_service,
+        config_service=config_service,
+        httpd_service=httpd_service,
+        hub=ws_hub,
+    )
 
-    app_provider = providers.Singleton(AppProvider, route_providers=[config_api])
+    config_api = providers.Singleton(create_config_api, config_service=config_service)
+
+    app_provider = providers.Singleton(
+        create_app_provider, route_providers=[config_api]
+    )
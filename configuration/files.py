@@ -0,0 +1,66 @@
+"""
+Helpers for hashing and safely writing build artifacts.
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(file_path: str) -> str:
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write(file_path: str, data: bytes) -> str:
+    """Write data to a temporary file and atomically rename it into place"""
+    directory = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return file_path
+
+
+def atomic_write_chunks(
+    file_path: str, chunks: Iterable[str], mode: Optional[int] = None
+) -> bool:
+    """
+    Stream text chunks to a temporary file and atomically rename it into place,
+    so readers never see a partially written file. The existing file is left
+    untouched, mtime included, when its contents already match.
+
+    Returns True if the file was replaced.
+    """
+    directory = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as file:
+            for chunk in chunks:
+                data = chunk.encode()
+                digest.update(data)
+                file.write(data)
+        if os.path.isfile(file_path) and file_digest(file_path) == digest.hexdigest():
+            os.remove(tmp_path)
+            return False
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
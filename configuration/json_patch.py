@@ -0,0 +1,138 @@
+"""
+A minimal implementation of JSON Patch (RFC 6902) over plain JSON documents.
+"""
+
+import copy
+from typing import Any, Dict, List
+
+
+class JsonPatchError(ValueError):
+    """A patch operation is malformed or its path does not exist"""
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """A test operation did not match the document"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split a JSON pointer (RFC 6901) into its unescaped reference tokens"""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    ]
+
+
+def list_index(container: list, token: str, allow_end: bool = False) -> int:
+    """Resolve a reference token to an index into container"""
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Invalid list index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"List index out of range: {token}")
+    return index
+
+
+def resolve(document: Any, tokens: List[str]) -> Any:
+    """The value at tokens in document"""
+    for token in tokens:
+        if isinstance(document, dict):
+            if token not in document:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[list_index(document, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return document
+
+
+def add(document: Any, tokens: List[str], value: Any) -> Any:
+    """Add value at tokens, returning the new document"""
+    if not tokens:
+        return value
+    parent = resolve(document, tokens[:-1])
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(list_index(parent, tokens[-1], allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to /{'/'.join(tokens)}")
+    return document
+
+
+def remove(document: Any, tokens: List[str]) -> Any:
+    """Remove and return the value at tokens"""
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+    parent = resolve(document, tokens[:-1])
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+        return parent.pop(tokens[-1])
+    if isinstance(parent, list):
+        return parent.pop(list_index(parent, tokens[-1]))
+    raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """
+    Apply a JSON Patch to a copy of document. Either every operation applies and
+    the patched copy is returned, or JsonPatchError is raised.
+    """
+    document = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or "path" not in operation:
+            raise JsonPatchError(f"Invalid operation: {operation!r}")
+        op = operation.get("op")
+        tokens = parse_pointer(operation["path"])
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(f"Operation {op} requires a value")
+
+        if op == "add":
+            document = add(document, tokens, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            remove(document, tokens)
+        elif op == "replace":
+            resolve(document, tokens)
+            if tokens:
+                remove(document, tokens)
+            document = add(document, tokens, copy.deepcopy(operation["value"]))
+        elif op in ("move", "copy"):
+            if "from" not in operation:
+                raise JsonPatchError(f"Operation {op} requires from")
+            source = parse_pointer(operation["from"])
+            if op == "move":
+                if tokens[: len(source)] == source and tokens != source:
+                    raise JsonPatchError("Cannot move a value into itself")
+                value = remove(document, source)
+            else:
+                value = copy.deepcopy(resolve(document, source))
+            document = add(document, tokens, value)
+        elif op == "test":
+            if resolve(document, tokens) != operation["value"]:
+                raise JsonPatchTestFailed(f"Test failed at {operation['path']}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+    return document
+
+
+def patched_fields(operations: List[Dict[str, Any]]) -> List[str]:
+    """The top level members of the document an operation reads or writes"""
+    fields = []
+    for operation in operations:
+        for key in ("path", "from"):
+            if not isinstance(operation, dict) or key not in operation:
+                continue
+            tokens = parse_pointer(operation[key])
+            if not tokens:
+                raise JsonPatchError(
+                    "Operations on the whole document are not supported"
+                )
+            if tokens[0] not in fields:
+                fields.append(tokens[0])
+    return fields
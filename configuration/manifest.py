@@ -0,0 +1,99 @@
+"""
+A manifest of rendered build artifacts, used to skip rendering nodes whose
+inputs have not changed since the last build.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+from configuration.config_diff import is_under
+from configuration.files import atomic_write, file_digest
+
+MANIFEST_VERSION = 1
+
+
+class RenderManifest:
+    """
+    Records, per tree node, the digest of the inputs used to render it, the
+    digests of the files it produced and, for templates, the configuration paths
+    the render read.
+    """
+
+    def __init__(self, path: str, entries: Dict[str, dict] = None):
+        self.path = path
+        self.entries = entries or {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> "RenderManifest":
+        """Load a manifest from disk, returning an empty manifest if it is missing or invalid"""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("entries", {}))
+
+    def save(self) -> None:
+        """Write the manifest to disk if it has changed"""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {"version": MANIFEST_VERSION, "entries": self.entries}
+        atomic_write(self.path, json.dumps(data, indent=2, sort_keys=True).encode())
+        self.dirty = False
+
+    def is_current(self, key: str, input_digest: str, outputs: List[str]) -> bool:
+        """Check that a node's inputs are unchanged and its outputs are intact"""
+        entry = self.entries.get(key)
+        if entry is None or entry.get("input") != input_digest:
+            return False
+        if len(entry.get("outputs", [])) != len(outputs):
+            return False
+        for output, expected in zip(outputs, entry["outputs"]):
+            if not os.path.isfile(output) or file_digest(output) != expected:
+                return False
+        return True
+
+    def record(
+        self,
+        key: str,
+        input_digest: str,
+        outputs: List[str],
+        dependencies: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Record the inputs and outputs of a freshly rendered node"""
+        entry = {
+            "input": input_digest,
+            "outputs": [file_digest(output) for output in outputs],
+        }
+        if dependencies is not None:
+            entry["dependencies"] = sorted(dependencies)
+        self.entries[key] = entry
+        self.dirty = True
+
+    def dependency_index(self) -> Dict[str, Set[str]]:
+        """Map each recorded configuration path to the keys of the nodes that read it"""
+        index: Dict[str, Set[str]] = {}
+        for key, entry in self.entries.items():
+            for path in entry.get("dependencies", ()):
+                index.setdefault(path, set()).add(key)
+        return index
+
+    def dependents(self, changed_paths: Iterable[str]) -> Set[str]:
+        """
+        The keys of the nodes affected by changes to changed_paths. A node is
+        affected when a changed path is at, above or below a path it read. Nodes
+        recorded without dependencies are affected by every change.
+        """
+        changed_paths = list(changed_paths)
+        keys = {
+            key for key, entry in self.entries.items() if "dependencies" not in entry
+        }
+        for path, readers in self.dependency_index().items():
+            if any(is_under(c, path) or is_under(path, c) for c in changed_paths):
+                keys |= readers
+        return keys
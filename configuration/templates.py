@@ -0,0 +1,159 @@
+"""
+Shared Jinja2 environments for rendering TemplateTree nodes. One environment is
+kept per template root so parsed templates are reused across nodes and builds.
+"""
+
+import os
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from jinja2 import (
+    BaseLoader,
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+    TemplateNotFound,
+    meta,
+)
+
+# Number of compiled templates kept in memory per environment
+TEMPLATE_CACHE_SIZE = 400
+
+_environments: Dict[Tuple[str, Optional[str]], Environment] = {}
+# Referenced names and templates per template path, with the mtime and size
+# they were read at
+_names: Dict[str, Tuple[int, int, FrozenSet[str], FrozenSet[str]]] = {}
+_lock = threading.Lock()
+
+
+class CompiledLoader(ModuleLoader):
+    """
+    A ModuleLoader that only serves a compiled template while it is at least as
+    new as its source, so edits made after precompile_templates take effect.
+    """
+
+    def __init__(self, compiled_template_root: str, template_root: str):
+        super().__init__(compiled_template_root)
+        self.compiled_template_root = compiled_template_root
+        self.template_root = template_root
+
+    def load(self, environment, name, globals=None):
+        module_path = os.path.join(
+            self.compiled_template_root, self.get_module_filename(name)
+        )
+        source_path = os.path.join(self.template_root, name)
+        try:
+            source_mtime = os.stat(source_path).st_mtime_ns
+            if os.stat(module_path).st_mtime_ns < source_mtime:
+                raise TemplateNotFound(name)
+        except OSError as e:
+            raise TemplateNotFound(name) from e
+
+        template = super().load(environment, name, globals)
+
+        def uptodate() -> bool:
+            try:
+                return os.stat(source_path).st_mtime_ns == source_mtime
+            except OSError:
+                return False
+
+        # Let auto_reload drop the cached template once the source changes
+        template._uptodate = uptodate
+        return template
+
+
+def get_environment(
+    template_root: str, compiled_template_root: Optional[str] = None
+) -> Environment:
+    """
+    Return the shared environment for a template root. Templates are compiled
+    once and cached in memory, with compiled bytecode also cached on disk so a
+    fresh process does not need to parse them again. Templates are reloaded when
+    their source changes. If compiled_template_root points at the output of
+    precompile_templates, those modules are used in preference to the sources
+    unless the source has been edited since it was compiled.
+    """
+    template_root = os.path.abspath(template_root)
+    if compiled_template_root is not None:
+        compiled_template_root = os.path.abspath(compiled_template_root)
+    key = (template_root, compiled_template_root)
+
+    env = _environments.get(key)
+    if env is None:
+        with _lock:
+            env = _environments.get(key)
+            if env is None:
+                loader: BaseLoader = FileSystemLoader(template_root)
+                if compiled_template_root and os.path.isdir(compiled_template_root):
+                    loader = ChoiceLoader(
+                        [CompiledLoader(compiled_template_root, template_root), loader]
+                    )
+                env = Environment(
+                    loader=loader,
+                    cache_size=TEMPLATE_CACHE_SIZE,
+                    auto_reload=True,
+                    bytecode_cache=FileSystemBytecodeCache(),
+                )
+                _environments[key] = env
+    return env
+
+
+def _analyze(
+    template_root: str, template_name: str
+) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Return the variables a template reads and the templates it pulls in"""
+    template_path = os.path.abspath(os.path.join(template_root, template_name))
+    stat = os.stat(template_path)
+    cached = _names.get(template_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2], cached[3]
+
+    env = get_environment(template_root)
+    source, _, _ = env.loader.get_source(env, template_name)
+    ast = env.parse(source)
+    names = frozenset(meta.find_undeclared_variables(ast))
+    # Dynamic references (e.g. {% include some_variable %}) are reported as None
+    templates = frozenset(
+        name for name in meta.find_referenced_templates(ast) if name is not None
+    )
+    with _lock:
+        _names[template_path] = (stat.st_mtime_ns, stat.st_size, names, templates)
+    return names, templates
+
+
+def template_closure(template_root: str, template_name: str) -> List[str]:
+    """
+    Return the template and every template it includes, extends or imports,
+    directly or indirectly, in a stable order.
+    """
+    seen = {template_name}
+    pending = [template_name]
+    while pending:
+        _, templates = _analyze(template_root, pending.pop())
+        for name in templates - seen:
+            seen.add(name)
+            pending.append(name)
+    return sorted(seen)
+
+
+def referenced_names(template_root: str, template_name: str) -> FrozenSet[str]:
+    """
+    Return the context variables a template reads, including those read by the
+    templates it pulls in. Results are cached until the template sources change.
+    """
+    names = set()
+    for name in template_closure(template_root, template_name):
+        names |= _analyze(template_root, name)[0]
+    return frozenset(names)
+
+
+def precompile_templates(template_root: str, target: str) -> str:
+    """
+    Compile every template under template_root into importable Python modules in
+    target, for use as a compiled_template_root.
+    """
+    env = get_environment(template_root)
+    os.makedirs(target, exist_ok=True)
+    env.compile_templates(target, zip=None)
+    return target
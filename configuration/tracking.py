@@ -0,0 +1,92 @@
+"""
+Proxies over render context values that record which configuration paths a
+template reads, so a configuration change only re-renders the templates that
+depend on it.
+"""
+
+from typing import Any, Iterator, Set
+from configuration.config_diff import join_path
+
+
+def track(value: Any, path: str, reads: Set[str]) -> Any:
+    """Wrap dicts and lists so reads below path are added to reads. Other values
+    are returned as they are, since reading them cannot be observed."""
+    if isinstance(value, dict):
+        return TrackingDict(value, path, reads)
+    if isinstance(value, list):
+        return TrackingList(value, path, reads)
+    return value
+
+
+class TrackingDict(dict):
+    """A dict that records the paths of the keys a template reads. Iterating over
+    it records the path of the dict itself, since any key may then be used."""
+
+    def __init__(self, data: dict, path: str, reads: Set[str]):
+        super().__init__(data)
+        self.path = path
+        self.reads = reads
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        path = join_path(self.path, str(key))
+        if not isinstance(value, (dict, list)):
+            self.reads.add(path)
+        return track(value, path, self.reads)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        self.reads.add(join_path(self.path, str(key)))
+        return default
+
+    def __contains__(self, key) -> bool:
+        self.reads.add(join_path(self.path, str(key)))
+        return super().__contains__(key)
+
+    def __iter__(self) -> Iterator:
+        self.reads.add(self.path)
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self.reads.add(self.path)
+        return super().__len__()
+
+    def keys(self):
+        self.reads.add(self.path)
+        return super().keys()
+
+    def values(self):
+        return [self[key] for key in super().keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+
+class TrackingList(list):
+    """A list that records the paths of the items a template reads. Iterating over
+    it, or taking its length, records the path of the list itself."""
+
+    def __init__(self, data: list, path: str, reads: Set[str]):
+        super().__init__(data)
+        self.path = path
+        self.reads = reads
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self.reads.add(self.path)
+            return track(super().__getitem__(index), self.path, self.reads)
+        value = super().__getitem__(index)
+        path = f"{self.path}[{index}]"
+        if not isinstance(value, (dict, list)):
+            self.reads.add(path)
+        return track(value, path, self.reads)
+
+    def __iter__(self) -> Iterator:
+        self.reads.add(self.path)
+        for index in range(super().__len__()):
+            yield track(super().__getitem__(index), f"{self.path}[{index}]", self.reads)
+
+    def __len__(self) -> int:
+        self.reads.add(self.path)
+        return super().__len__()
@@ -5,13 +5,23 @@ This module contains the abstract nodes for the build process.
 import os
 import shutil
 import copy
-from typing import List, Optional
-from jinja2 import Environment, FileSystemLoader
-from pydantic import BaseModel, Field
+import hashlib
+import json
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
 from auth.auth import UserCredential, to_htpasswd_file, to_passwd_file
 from auth.certificates import generate_self_signed_cert
 from auth.password import random_password
-from passlib.apache import HtpasswdFile
+from configuration.files import atomic_write_chunks
+from configuration.templates import (
+    get_environment,
+    referenced_names,
+    template_closure,
+)
+
+if TYPE_CHECKING:
+    from passlib.apache import HtpasswdFile
 
 
 class AdminContext(BaseModel):
@@ -28,6 +38,27 @@ class AdminContext(BaseModel):
     ]
 
 
+class TreeCache:
+    """Lookup caches for an FSTree node. Caches are never carried over to copies
+    of a node, since a copy may end up in a different tree."""
+
+    __slots__ = ("index", "location", "paths")
+
+    def __init__(self):
+        # Index of descendants by path of names, only populated on the root node
+        self.index: Optional[Dict[str, "FSTree"]] = None
+        # The node's root and its key in the root's index
+        self.location: Optional[Tuple["FSTree", str]] = None
+        # Absolute paths memoized per build root
+        self.paths: Dict[str, str] = {}
+
+    def __copy__(self):
+        return TreeCache()
+
+    def __deepcopy__(self, memo):
+        return TreeCache()
+
+
 class FSTree(BaseModel):
     """A tree of build artifacts"""
 
@@ -38,32 +69,145 @@ class FSTree(BaseModel):
     parent: Optional["FSTree"] = Field(default=None, exclude=True)
     children: List["FSTree"] = []
 
+    _cache: TreeCache = PrivateAttr(default_factory=TreeCache)
+
     def __init__(self, **data):
         super().__init__(**data)
         for child in self.children:
-            child.parent = self
+            if child.parent is None and child.is_uncached():
+                # A detached, uncached child has nothing to invalidate
+                child.__dict__["parent"] = self
+            else:
+                child.parent = self
         if self.path is None:
-            self.path = self.name
+            self.__dict__["path"] = self.name
+
+    def is_uncached(self) -> bool:
+        """Whether no location or paths have been cached for this node"""
+        cache = self.__pydantic_private__["_cache"]
+        return cache.location is None and not cache.paths
+
+    def __setattr__(self, name, value):
+        old_parent = self.parent if name == "parent" else None
+        super().__setattr__(name, value)
+        if name not in ("name", "path", "parent", "children"):
+            return
+        if name == "children":
+            for child in value:
+                child.parent = self
+        if old_parent is not None and old_parent is not value:
+            # Moving a node detaches it from its previous parent
+            old_parent.children[:] = [
+                child for child in old_parent.children if child is not self
+            ]
+            old_parent.root()._cache.index = None
+        self.invalidate()
+
+    def __copy__(self):
+        copied = super().__copy__()
+        copied._cache = TreeCache()
+        return copied
+
+    def invalidate(self) -> None:
+        """Drop the cached paths of this subtree and the index of its root"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            cache = node._cache
+            # Descendants are only ever cached after their ancestors, so an
+            # uncached node has an uncached subtree
+            if cache.location is None and not cache.paths:
+                continue
+            cache.location = None
+            cache.paths.clear()
+            stack.extend(node.children)
+        self.root()._cache.index = None
+
+    def root(self) -> "FSTree":
+        """Get the root node of the tree"""
+        # Climb without populating location caches, so that invalidating a node
+        # while a tree is being built never leaves caches behind to clear later
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def _locate(self) -> Tuple["FSTree", str]:
+        # Climb to the nearest located ancestor, then fill in the locations below it
+        unlocated = []
+        node = self
+        while node is not None and node._cache.location is None:
+            unlocated.append(node)
+            node = node.parent
+        for node in reversed(unlocated):
+            if node.parent is None:
+                node._cache.location = (node, "")
+            else:
+                root, key = node.parent._cache.location
+                node._cache.location = (
+                    root,
+                    f"{key}/{node.name}" if key else node.name,
+                )
+        return self._cache.location
+
+    def _tree_index(self) -> Dict[str, "FSTree"]:
+        if self._cache.index is None:
+            index = {}
+            stack = [(child, child.name) for child in reversed(self.children)]
+            while stack:
+                node, key = stack.pop()
+                index.setdefault(key, node)
+                stack.extend(
+                    (child, f"{key}/{child.name}") for child in reversed(node.children)
+                )
+            for key, node in list(index.items()):
+                index.setdefault(key.replace("/", "."), node)
+            self._cache.index = index
+        return self._cache.index
 
     def get(self, name: str) -> Optional["FSTree"]:
         """Get a child node by name"""
-        for child in self.children:
-            if child.name == name:
-                return child
-        return None
+        if "/" in name:
+            return None
+        root, key = self._locate()
+        return root._tree_index().get(f"{key}/{name}" if key else name)
+
+    def find(self, path: str) -> Optional["FSTree"]:
+        """Find a descendant by a slash or dot separated path of names, e.g.
+        apache/conf/extra/httpd-ssl.conf or apache.conf.extra"""
+        path = path.strip("/")
+        if not path:
+            return self
+        root, key = self._locate()
+        index = root._tree_index()
+        node = index.get(f"{key}/{path}" if key else path)
+        if node is None and "/" not in path:
+            dotted = key.replace("/", ".")
+            node = index.get(f"{dotted}.{path}" if dotted else path)
+        return node
 
     def tree_root_path(self, build_root: str, apath: str = None) -> str:
         """Convert a path to a path relative to the tree and root"""
-        if apath is None:
-            apath = self.path
-        if self.parent:
-            parent_node: FSTree = self.parent
-            abs_path = parent_node.tree_root_path(build_root) + f"/{apath}"
-        elif build_root == "":
-            abs_path = apath
-        else:
-            abs_path = f"{build_root}/{apath}"
-        return abs_path
+        if apath is not None:
+            if self.parent is None:
+                return apath if build_root == "" else f"{build_root}/{apath}"
+            return self.parent.tree_root_path(build_root) + f"/{apath}"
+
+        # Climb to the nearest ancestor with a memoized path, then fill in below it
+        unresolved = []
+        node = self
+        while node is not None and build_root not in node._cache.paths:
+            unresolved.append(node)
+            node = node.parent
+        for node in reversed(unresolved):
+            if node.parent is not None:
+                abs_path = node.parent._cache.paths[build_root] + f"/{node.path}"
+            elif build_root == "":
+                abs_path = node.path
+            else:
+                abs_path = f"{build_root}/{node.path}"
+            node._cache.paths[build_root] = abs_path
+        return self._cache.paths[build_root]
 
     def make_path(self, build_root: str) -> str:
         """Create a directory or touch a file path"""
@@ -108,23 +252,70 @@ class TemplateTree(FSTree):
         super().__init__(**data)
         self.isDir = False
 
-    def render(self, build_root: str, template_root: Optional[str] = None, **kwargs):
-        """Render a template to a file"""
-        abs_path = self.make_path(build_root)
+    def generate(
+        self,
+        build_root: str,
+        template_root: Optional[str] = None,
+        compiled_template_root: Optional[str] = None,
+        **kwargs,
+    ) -> Iterator[str]:
+        """Render the template lazily, yielding chunks of output"""
         template_root = template_root or build_root
-        template_path = f"{template_root}/{self.template_path}"
-        env = Environment(loader=FileSystemLoader(os.path.dirname(template_path)))
-        template = env.get_template(os.path.basename(self.template_path))
-        rendered_content = template.render(**kwargs)
-        with open(abs_path, "w") as file:
-            file.write(rendered_content)
+        env = get_environment(template_root, compiled_template_root)
+        return env.get_template(self.template_path).generate(**kwargs)
+
+    def template_mode(
+        self, build_root: str, template_root: Optional[str] = None, **kwargs
+    ) -> int:
+        """The file mode that render copies from the template"""
+        template_root = template_root or build_root
+        return os.stat(f"{template_root}/{self.template_path}").st_mode
 
-        # Replicate file permissions from the template
-        template_stat = os.stat(template_path)
-        os.chmod(abs_path, template_stat.st_mode)
+    def render(
+        self,
+        build_root: str,
+        template_root: Optional[str] = None,
+        compiled_template_root: Optional[str] = None,
+        **kwargs,
+    ):
+        """Stream a template to a file, replacing it atomically if it changed"""
+        abs_path = self.tree_root_path(build_root)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        template_root = template_root or build_root
+        mode = self.template_mode(build_root, template_root)
+        chunks = self.generate(
+            build_root, template_root, compiled_template_root, **kwargs
+        )
+        # Permissions are replicated from the template before the rename
+        replaced = atomic_write_chunks(abs_path, chunks, mode)
+        if not replaced and os.stat(abs_path).st_mode != mode:
+            os.chmod(abs_path, mode)
 
         return abs_path
 
+    def input_digest(
+        self,
+        build_root: str,
+        template_root: Optional[str] = None,
+        compiled_template_root: Optional[str] = None,
+        **kwargs,
+    ) -> str:
+        """Hash the sources of the template and the templates it includes, extends
+        or imports, its mode and the context values they reference"""
+        template_root = template_root or build_root
+        template_path = f"{template_root}/{self.template_path}"
+        names = referenced_names(template_root, self.template_path)
+        context = {"build_root": build_root, "template_root": template_root, **kwargs}
+        used = {name: context.get(name) for name in sorted(names)}
+
+        digest = hashlib.sha256()
+        for name in template_closure(template_root, self.template_path):
+            with open(f"{template_root}/{name}", "rb") as file:
+                digest.update(name.encode() + b"\0" + file.read() + b"\0")
+        digest.update(str(os.stat(template_path).st_mode).encode())
+        digest.update(json.dumps(used, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
 
 class Htpasswd(FSTree):
     """A tree node that represents an htpasswd file"""
@@ -137,17 +328,26 @@ class Htpasswd(FSTree):
         self.cleanup = False
 
     def render(
-        self, build_root: str, users: List[UserCredential], overwrite: bool = False
+        self,
+        build_root: str,
+        users: List[UserCredential],
+        overwrite: bool = False,
+        executor: Optional[Executor] = None,
     ):
-        """Render a template to a file"""
+        """Render a template to a file, optionally hashing passwords on an executor"""
         abs_path = self.make_path(build_root)
         do_overwrite = overwrite or self.overwrite
         if not os.path.exists(abs_path) or do_overwrite:
-            to_htpasswd_file(users, abs_path)
+            if executor is None:
+                to_htpasswd_file(users, abs_path)
+            else:
+                executor.submit(to_htpasswd_file, users, abs_path).result()
         return abs_path
 
-    def read(self, build_root: str) -> HtpasswdFile:
+    def read(self, build_root: str) -> "HtpasswdFile":
         """Read a htpasswd file"""
+        from passlib.apache import HtpasswdFile
+
         abs_path = self.tree_root_path(build_root)
         ht = HtpasswdFile(abs_path)
         return ht
@@ -196,17 +396,36 @@ class SelfSignedCerts(FSTree):
     ):
         super().__init__(children=children, **data)
 
-    def render(self, build_root: str, admin: AdminContext):
-        """Render a template to a file"""
-        abs_path = self.make_path(build_root)
-        generate_self_signed_cert(
-            admin.domain,
-            abs_path,
-            country=admin.country,
-            state=admin.state,
-            locality=admin.locality,
-            organization=admin.organization,
+    def outputs(self, build_root: str) -> List[str]:
+        """The certificate and key files produced by render"""
+        abs_path = self.tree_root_path(build_root)
+        return [f"{abs_path}/server-cert.pem", f"{abs_path}/server-key.pem"]
+
+    @staticmethod
+    def input_digest(admin: AdminContext) -> str:
+        """Hash the admin values that end up in the certificate subject"""
+        subject = admin.model_dump(
+            include={"domain", "country", "state", "locality", "organization"}
         )
+        return hashlib.sha256(json.dumps(subject, sort_keys=True).encode()).hexdigest()
+
+    def render(
+        self, build_root: str, admin: AdminContext, executor: Optional[Executor] = None
+    ):
+        """Render a template to a file, optionally generating the key on an executor"""
+        abs_path = self.make_path(build_root)
+        subject = {
+            "country": admin.country,
+            "state": admin.state,
+            "locality": admin.locality,
+            "organization": admin.organization,
+        }
+        if executor is None:
+            generate_self_signed_cert(admin.domain, abs_path, **subject)
+        else:
+            executor.submit(
+                generate_self_signed_cert, admin.domain, abs_path, **subject
+            ).result()
         return abs_path
 
 
@@ -0,0 +1,205 @@
+"""
+Dry-run planning for tree walkers. Planners compute the filesystem operations a
+render or removal would perform without touching disk, so changes can be
+reviewed, serialized and applied later.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+from configuration.app import Config
+from configuration.files import file_digest
+from configuration.manifest import RenderManifest
+from configuration.tree_nodes import (
+    FSTree,
+    TemplateTree,
+    Htpasswd,
+    Passwd,
+    SelfSignedCerts,
+)
+from configuration.tree_walker import (
+    IncrementalTreeRenderer,
+    TreeRemoval,
+    TreeRenderer,
+    TreeWalker,
+)
+
+MKDIR = "mkdir"
+TOUCH = "touch"
+WRITE = "write"
+CHMOD = "chmod"
+CERT = "cert"
+REMOVE = "remove"
+
+
+@dataclass
+class PlanOperation:
+    """A single filesystem operation of a plan"""
+
+    action: str
+    path: str
+    size: Optional[int] = None
+    size_delta: Optional[int] = None
+    mode: Optional[int] = None
+    node: Optional[FSTree] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> dict:
+        """Convert the operation to a JSON serializable dictionary"""
+        data = {"action": self.action, "path": self.path}
+        if self.size is not None:
+            data["size"] = self.size
+            data["size_delta"] = self.size_delta
+        if self.mode is not None:
+            data["mode"] = oct(self.mode & 0o7777)
+        return data
+
+    def __str__(self) -> str:
+        detail = ""
+        if self.size is not None:
+            detail = f" ({self.size} bytes, {self.size_delta:+d})"
+        elif self.mode is not None:
+            detail = f" ({oct(self.mode & 0o7777)})"
+        return f"{self.action:<6} {self.path}{detail}"
+
+
+@dataclass
+class TreePlan:
+    """The operations a walk would perform, in the order it would perform them"""
+
+    operations: List[PlanOperation] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def __str__(self) -> str:
+        if not self.operations:
+            return "No changes"
+        return "\n".join(str(operation) for operation in self.operations)
+
+    def to_json(self) -> str:
+        """Serialize the plan"""
+        return json.dumps([operation.to_dict() for operation in self.operations])
+
+    def apply(self, context: Config) -> List[str]:
+        """Perform the planned operations on the nodes they were planned for"""
+        renderer = TreeRenderer()
+        remover = TreeRemoval()
+        results = []
+        applied = set()
+        for operation in self.operations:
+            if operation.node is None or id(operation.node) in applied:
+                continue
+            applied.add(id(operation.node))
+            walker = remover if operation.action == REMOVE else renderer
+            results.append(walker.process_node(operation.node, context))
+        return results
+
+
+class TreePlanner(TreeWalker):
+    """A base class for walkers whose handlers return lists of operations"""
+
+    def plan(self, node: FSTree, context: Config) -> TreePlan:
+        """Walk the tree and collect the planned operations"""
+        operations = []
+        for _, result in self.iter_walk(node, context):
+            operations.extend(result or [])
+        return TreePlan(operations)
+
+    def default(self, node: FSTree, context: Config):
+        """Plan nothing for an FSTree node"""
+        return []
+
+
+class RenderPlanner(TreePlanner):
+    """Plans the operations of a render. With incremental set, certificates are
+    planned the way IncrementalTreeRenderer decides to regenerate them, using
+    the manifest of a previous render."""
+
+    def __init__(self, incremental: bool = True):
+        self.incremental = incremental
+        self.manifest: Optional[RenderManifest] = None
+
+    def plan(self, node: FSTree, context: Config) -> TreePlan:
+        """Plan a render of the tree"""
+        if self.incremental:
+            root_path = node.tree_root_path(context.build.build_root)
+            self.manifest = RenderManifest.load(
+                os.path.join(root_path, IncrementalTreeRenderer.manifest_name)
+            )
+        try:
+            return super().plan(node, context)
+        finally:
+            self.manifest = None
+
+    def on_fs_tree(self, node: FSTree, context: Config):
+        """Plan creating a directory or touching a file"""
+        abs_path = node.tree_root_path(context.build.build_root)
+        if os.path.exists(abs_path):
+            return []
+        return [PlanOperation(MKDIR if node.isDir else TOUCH, abs_path, node=node)]
+
+    def on_template_tree(self, node: TemplateTree, context: Config):
+        """Plan writing a template whose rendered content or mode would change"""
+        kwargs = self.template_kwargs(node, context)
+        abs_path = node.tree_root_path(context.build.build_root)
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in node.generate(**kwargs):
+            data = chunk.encode()
+            digest.update(data)
+            size += len(data)
+        mode = node.template_mode(**kwargs)
+
+        if not os.path.exists(abs_path):
+            return [PlanOperation(WRITE, abs_path, size, size, mode, node=node)]
+        operations = []
+        current_size = os.path.getsize(abs_path)
+        if current_size != size or file_digest(abs_path) != digest.hexdigest():
+            operations.append(
+                PlanOperation(
+                    WRITE, abs_path, size, size - current_size, mode, node=node
+                )
+            )
+        if os.stat(abs_path).st_mode != mode:
+            operations.append(PlanOperation(CHMOD, abs_path, mode=mode, node=node))
+        return operations
+
+    def on_htpasswd(self, node: Htpasswd, context: Config):
+        """Plan writing a password file the way Htpasswd.render would"""
+        abs_path = node.tree_root_path(context.build.build_root)
+        if node.overwrite:
+            return [PlanOperation(WRITE, abs_path, node=node)]
+        return self.on_fs_tree(node, context)
+
+    on_passwd = on_htpasswd
+
+    def on_self_signed_certs(self, node: SelfSignedCerts, context: Config):
+        """Plan regenerating the certificate and key"""
+        build_root = context.build.build_root
+        operations = self.on_fs_tree(node, context)
+        if self.manifest is not None and self.manifest.is_current(
+            node.tree_root_path(""),
+            node.input_digest(context.admin),
+            node.outputs(build_root),
+        ):
+            return operations
+        operations.append(
+            PlanOperation(CERT, node.tree_root_path(build_root), node=node)
+        )
+        return operations
+
+
+class RemovalPlanner(TreePlanner):
+    """Plans the operations of a TreeRemoval walk"""
+
+    post_order = True
+
+    def default(self, node: FSTree, context: Config):
+        """Plan removing a path that exists and may be cleaned up"""
+        abs_path = node.tree_root_path(context.build.build_root)
+        if node.cleanup and os.path.exists(abs_path):
+            return [PlanOperation(REMOVE, abs_path, node=node)]
+        return []
@@ -2,7 +2,31 @@
 Tree walking functions for dealing with configuration trees.
 """
 
-from configuration.app import Config
+import multiprocessing
+import os
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+from configuration.app import Config, RenderContext
+from configuration.manifest import RenderManifest
 from configuration.tree_nodes import (
     FSTree,
     TemplateTree,
@@ -12,51 +36,140 @@ from configuration.tree_nodes import (
 )
 
 
+def iter_tree(
+    node: FSTree, prune: Optional[Callable[[FSTree], bool]] = None
+) -> Iterator[FSTree]:
+    """Iterate over a tree in pre-order without recursion, skipping the subtrees
+    of nodes for which prune returns True. Children are visited lazily, so nodes
+    added beneath a node before moving past it are included."""
+    stack = [iter((node,))]
+    while stack:
+        current = next(stack[-1], None)
+        if current is None:
+            stack.pop()
+            continue
+        if prune is not None and prune(current):
+            continue
+        yield current
+        stack.append(iter(current.children))
+
+
+# Handler method names by node class, extended with TreeWalker.register_node_type
+_NODE_HANDLERS: Dict[type, str] = {
+    FSTree: "on_fs_tree",
+    TemplateTree: "on_template_tree",
+    Htpasswd: "on_htpasswd",
+    Passwd: "on_passwd",
+    SelfSignedCerts: "on_self_signed_certs",
+}
+# Resolved handler functions by (walker class, node class)
+_DISPATCH: Dict[Tuple[type, type], Callable] = {}
+
+
 class TreeWalker:
     """A class to walk through FSTree nodes.  Users may optionally override
     the type specific methods to handle different types of nodes, and/or specify
     a default method to handle nodes that aren't specifically defined."""
 
+    # Whether iter_walk processes children before their parents by default
+    post_order = False
+
+    def iter_walk(
+        self,
+        node: FSTree,
+        context: Config,
+        post_order: Optional[bool] = None,
+        prune: Optional[Callable[[FSTree], bool]] = None,
+    ) -> Iterator[Tuple[FSTree, Any]]:
+        """Lazily walk the tree, yielding (node, result) pairs. Parents are
+        processed before their children unless post_order is set. Nodes for which
+        prune returns True are skipped along with their subtrees. Stop iterating
+        to end the walk early. Only the path to the current node is held in memory."""
+        if post_order is None:
+            post_order = self.post_order
+        self._render_context = None
+        if prune is not None and prune(node):
+            return
+
+        if post_order:
+            stack = [(node, iter(node.children))]
+            while stack:
+                current, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    yield current, self.process_node(current, context)
+                elif prune is None or not prune(child):
+                    stack.append((child, iter(child.children)))
+        else:
+            for current in iter_tree(node, prune):
+                yield current, self.process_node(current, context)
+
     def walk(self, node: FSTree, context: Config):
         """Walk through the tree and process the nodes"""
-        results = []
-
-        result = self.process_node(node, context)
-        if result:
-            results.append(result)
-
-        for child in node.children:
-            results.extend(self.walk(child, context))
-
-        return results
+        return [
+            result
+            for _, result in self.iter_walk(node, context, post_order=False)
+            if result
+        ]
 
     def depth_first(self, node: FSTree, context: Config):
         """Walk through the tree and process the nodes"""
-        results = []
-
-        for child in node.children:
-            results.extend(self.depth_first(child, context))
-
-        result = self.process_node(node, context)
-        if result:
-            results.append(result)
-
-        return results
+        return [
+            result
+            for _, result in self.iter_walk(node, context, post_order=True)
+            if result
+        ]
+
+    @classmethod
+    def register_node_type(cls, node_class: Type[FSTree], method_name: str):
+        """Route nodes of node_class, and its subclasses, to the walker method
+        named method_name. Walkers without that method fall back to the handler
+        of the nearest registered base class, and then to default."""
+        _NODE_HANDLERS[node_class] = method_name
+        _DISPATCH.clear()
+        return node_class
+
+    @classmethod
+    def resolve_handler(cls, node_class: type) -> Callable:
+        """Find the function that handles node_class for this walker class. The
+        result is cached per (walker class, node class) pair."""
+        key = (cls, node_class)
+        handler = _DISPATCH.get(key)
+        if handler is None:
+            method_names = [
+                _NODE_HANDLERS[base]
+                for base in node_class.__mro__
+                if base in _NODE_HANDLERS
+            ]
+            if not method_names:
+                raise ValueError(f"Unknown node type: {node_class}")
+            handler = next(
+                (getattr(cls, name) for name in method_names if hasattr(cls, name)),
+                cls.default,
+            )
+            _DISPATCH[key] = handler
+        return handler
 
     def process_node(self, node: FSTree, context: Config):
         """Process a node based on its type"""
-        if isinstance(node, TemplateTree):
-            return self.call_method("on_template_tree", node, context)
-        elif isinstance(node, Htpasswd):
-            return self.call_method("on_htpasswd", node, context)
-        elif isinstance(node, Passwd):
-            return self.call_method("on_passwd", node, context)
-        elif isinstance(node, SelfSignedCerts):
-            return self.call_method("on_self_signed_certs", node, context)
-        elif isinstance(node, FSTree):
-            return self.call_method("on_fs_tree", node, context)
-        else:
-            raise ValueError(f"Unknown node type: {node}")
+        return self.resolve_handler(type(node))(self, node, context)
+
+    def render_context(self, context: Config) -> RenderContext:
+        """The render context of the current walk, built once and shared by all
+        templates"""
+        render_context = getattr(self, "_render_context", None)
+        if render_context is None or render_context.config is not context:
+            render_context = self._render_context = RenderContext(context)
+        return render_context
+
+    def template_kwargs(
+        self, node: TemplateTree, context: Config, reads: Optional[Set[str]] = None
+    ) -> dict:
+        """The render arguments for a template: the slice of the configuration it
+        references. If reads is given, the paths the template reads are added to
+        it during rendering."""
+        return self.render_context(context).for_template(node.template_path, reads)
 
     def call_method(self, method_name: str, node: FSTree, context: Config):
         """Call a method if it exists, otherwise call a default method"""
@@ -123,7 +236,7 @@ class TreeRenderer(TreeWalker):
 
     def on_template_tree(self, node: TemplateTree, context: Config):
         """Handle a TemplateTree node"""
-        kwargs = context.to_kwargs()
+        kwargs = self.template_kwargs(node, context)
         return node.render(
             **kwargs,
         )
@@ -137,9 +250,168 @@ class TreeRenderer(TreeWalker):
         return node.render(context.build.build_root, admin=context.admin)
 
 
+class IncrementalTreeRenderer(TreeRenderer):
+    """A TreeRenderer that skips templates and certificates whose inputs are
+    unchanged since the last render. Input and output digests are kept in a
+    manifest file at the root of the rendered tree."""
+
+    manifest_name = ".render-manifest.json"
+
+    def __init__(self):
+        self.manifest: Optional[RenderManifest] = None
+        self.changed: List[str] = []
+        # Executor for certificate generation, used by ParallelTreeRenderer
+        self.process_pool: Optional[Executor] = None
+        self.lock = threading.Lock()
+
+    def open_manifest(self, node: FSTree, context: Config) -> None:
+        """Load the manifest kept at the root of the rendered tree"""
+        root_path = node.tree_root_path(context.build.build_root)
+        self.manifest = RenderManifest.load(os.path.join(root_path, self.manifest_name))
+        self.changed = []
+        self._render_context = None
+
+    def close_manifest(self) -> None:
+        """Save the manifest if anything was rendered"""
+        self.manifest.save()
+        self.manifest = None
+
+    def iter_walk(
+        self,
+        node: FSTree,
+        context: Config,
+        post_order: Optional[bool] = None,
+        prune: Optional[Callable[[FSTree], bool]] = None,
+    ) -> Iterator[Tuple[FSTree, Any]]:
+        """Walk the tree, loading the manifest before and saving it after"""
+        if self.manifest is not None:
+            yield from super().iter_walk(node, context, post_order, prune)
+            return
+
+        self.open_manifest(node, context)
+        try:
+            yield from super().iter_walk(node, context, post_order, prune)
+        finally:
+            self.close_manifest()
+
+    def render_if_stale(
+        self,
+        node: FSTree,
+        input_digest: str,
+        outputs: List[str],
+        render: Callable[[], str],
+        build_root: str,
+        dependencies: Optional[Callable[[], Iterable[str]]] = None,
+    ) -> str:
+        """Call render unless the manifest shows the node's outputs are current.
+        dependencies, if given, is called after rendering for the configuration
+        paths the render read."""
+        key = node.tree_root_path("")
+        if self.manifest.is_current(key, input_digest, outputs):
+            return node.tree_root_path(build_root)
+        abs_path = render()
+        with self.lock:
+            self.manifest.record(
+                key, input_digest, outputs, dependencies() if dependencies else None
+            )
+            self.changed.append(abs_path)
+        return abs_path
+
+    def on_template_tree(self, node: TemplateTree, context: Config):
+        """Render a TemplateTree node if its template or context values changed,
+        recording the configuration paths it reads"""
+        kwargs = self.template_kwargs(node, context)
+        build_root = context.build.build_root
+        reads: Set[str] = set()
+        return self.render_if_stale(
+            node,
+            node.input_digest(**kwargs),
+            [node.tree_root_path(build_root)],
+            lambda: node.render(**self.template_kwargs(node, context, reads)),
+            build_root,
+            lambda: self.render_context(context).dependencies(
+                node.template_path, reads
+            ),
+        )
+
+    def on_self_signed_certs(self, node: SelfSignedCerts, context: Config):
+        """Regenerate certificates only if the subject changed or the files are gone"""
+        build_root = context.build.build_root
+        return self.render_if_stale(
+            node,
+            node.input_digest(context.admin),
+            node.outputs(build_root),
+            lambda: node.render(
+                build_root, admin=context.admin, executor=self.process_pool
+            ),
+            build_root,
+        )
+
+
+class ParallelTreeRenderer(IncrementalTreeRenderer):
+    """An IncrementalTreeRenderer that renders independent nodes concurrently. A
+    node is scheduled as soon as its parent has been rendered, so directories
+    always exist before their children are written. Template rendering and file
+    I/O run on a thread pool, while RSA key generation and password hashing are
+    handed to a process pool. Unchanged nodes are skipped using the same manifest
+    as the serial renderer, and results are returned in the same order as
+    TreeRenderer.walk."""
+
+    def __init__(
+        self, max_threads: Optional[int] = None, max_processes: Optional[int] = None
+    ):
+        super().__init__()
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+
+    def walk(self, node: FSTree, context: Config):
+        """Render the tree concurrently and return results in pre-order"""
+        results: Dict[int, object] = {}
+        self.open_manifest(node, context)
+        # Workers come from a forkserver rather than being forked from this
+        # process while the thread pool is busy
+        processes = ProcessPoolExecutor(
+            self.max_processes, mp_context=multiprocessing.get_context("forkserver")
+        )
+        with processes, ThreadPoolExecutor(self.max_threads) as threads:
+            self.process_pool = processes
+            pending: Dict[Future, FSTree] = {
+                threads.submit(self.process_node, node, context): node
+            }
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        parent = pending.pop(future)
+                        results[id(parent)] = future.result()
+                        for child in parent.children:
+                            future = threads.submit(self.process_node, child, context)
+                            pending[future] = child
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+            finally:
+                self.process_pool = None
+                self.close_manifest()
+
+        return [
+            results[id(current)] for current in iter_tree(node) if results[id(current)]
+        ]
+
+    def on_htpasswd(self, node: Htpasswd, context: Config):
+        return node.render(
+            context.build.build_root,
+            users=context.admin.users,
+            executor=self.process_pool,
+        )
+
+
 class TreeRemoval(TreeWalker):
     """A class to remove FSTree nodes from the filesystem"""
 
+    post_order = True
+
     def default(self, node: FSTree, context: Config):
         """Handle an FSTree node"""
         return node.rm_path(context.build.build_root)
@@ -0,0 +1,119 @@
+"""
+Fast YAML loading for configuration files. Files are parsed with the libyaml C
+loader when it is available, and the result of parsing and validating a file is
+cached in a pickle beside it, keyed by the file's sha256 digest and mtime, so
+later loads of an unchanged file skip both steps.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sys
+from typing import Any, Callable, Set, Type, get_args
+import pydantic
+import yaml
+from pydantic import BaseModel
+
+from configuration.files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# The C loader is several times faster, but is only built when libyaml is present
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+CACHE_VERSION = 1
+
+_MISS = object()
+
+
+def parse_yaml(data) -> Any:
+    """Parse a YAML string, bytes or stream with the fastest safe loader"""
+    return yaml.load(data, Loader=YamlLoader)
+
+
+def cache_path(file_path: str, kind: str) -> str:
+    """The cache file kept beside file_path for results of the given kind"""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, f".{name}.{kind}.cache")
+
+
+def model_fingerprint(model_class: Type[BaseModel]) -> str:
+    """
+    Identify the version of a model's schema by the source files of every model
+    reachable from it, so cached validation results are dropped when the models
+    they were validated against change.
+    """
+    modules: Set[str] = set()
+    seen: Set[type] = set()
+    pending = [model_class]
+    while pending:
+        annotation = pending.pop()
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            if annotation in seen:
+                continue
+            seen.add(annotation)
+            modules.add(annotation.__module__)
+            pending.extend(
+                field.annotation for field in annotation.model_fields.values()
+            )
+        else:
+            pending.extend(get_args(annotation))
+
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{pydantic.VERSION}".encode())
+    for name in sorted(modules):
+        source = getattr(sys.modules.get(name), "__file__", None)
+        stat = os.stat(source) if source else None
+        digest.update(
+            f"{name}:{stat and stat.st_mtime_ns}:{stat and stat.st_size}".encode()
+        )
+    return digest.hexdigest()
+
+
+def read_cache(path: str, key: tuple) -> Any:
+    """Return the cached value stored under key, or _MISS"""
+    try:
+        stat = os.stat(path)
+        # The cache is unpickled, so only trust files nobody else could have written
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+            return _MISS
+        with open(path, "rb") as file:
+            cached_key, value = pickle.load(file)
+    except Exception:
+        # Missing, truncated, or pickled from classes that have since changed
+        return _MISS
+    return value if cached_key == key else _MISS
+
+
+def write_cache(path: str, key: tuple, value: Any) -> None:
+    """Store value under key, readable only by the owner since it may hold secrets"""
+    try:
+        data = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        # atomic_write creates the file with mkstemp, which makes it mode 0600
+        atomic_write(path, data)
+    except (OSError, pickle.PicklingError) as e:
+        logger.warning("Could not write configuration cache %s: %s", path, e)
+
+
+def cached_load(
+    file_path: str,
+    kind: str,
+    transform: Callable[[Any], Any] = lambda data: data,
+    fingerprint: str = "",
+) -> Any:
+    """
+    Parse a YAML file and pass the result through transform, returning a cached
+    result instead when the file's contents, mtime and the fingerprint of the
+    transform all match the cached ones.
+    """
+    with open(file_path, "rb") as file:
+        source = file.read()
+        mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+    key = (hashlib.sha256(source).hexdigest(), mtime_ns, fingerprint)
+    path = cache_path(file_path, kind)
+
+    value = read_cache(path, key)
+    if value is _MISS:
+        value = transform(parse_yaml(source))
+        write_cache(path, key, value)
+    return value
@@ -20,38 +20,36 @@ class CertbotService:
     """
 
     def __init__(self, config_service: ConfigService):
-        self.config = config_service.config
-        self.web_root_path = self.config.build_paths.get("webroot").tree_root_path(
+        self.config_service = config_service
+        build_paths = self.config.build_paths
+        self.web_root_path = build_paths.find("webroot").tree_root_path(WORKSPACE)
+        self.certbot_config_path = build_paths.find(
+            "apache/conf/letsencrypt"
+        ).tree_root_path(WORKSPACE)
+        self.certbot_work_path = build_paths.find("certbot/work").tree_root_path(
             WORKSPACE
         )
-        self.certbot_config_path = (
-            self.config.build_paths.get("apache")
-            .get("conf")
-            .get("letsencrypt")
-            .tree_root_path(WORKSPACE)
-        )
-        self.certbot_work_path = (
-            self.config.build_paths.get("certbot").get("work").tree_root_path(WORKSPACE)
-        )
-        self.certbot_logs_path = (
-            self.config.build_paths.get("certbot").get("logs").tree_root_path(WORKSPACE)
+        self.certbot_logs_path = build_paths.find("certbot/logs").tree_root_path(
+            WORKSPACE
         )
         if self.config.runtime.withinContainer:
-            self.certbot_ssl_config_path = (
-                self.config.container_paths.get("conf")
-                .get("extra")
-                .get("httpd-ssl.conf")
-                .tree_root_path("")
-            )
+            self.certbot_ssl_config_path = self.config.container_paths.find(
+                "conf/extra/httpd-ssl.conf"
+            ).tree_root_path("")
         else:
-            self.certbot_ssl_config_path = (
-                self.config.build_paths.get("apache")
-                .get("conf")
-                .get("extra")
-                .get("httpd-ssl.conf")
-                .tree_root_path(WORKSPACE)
-            )
-        self.email = self.config.admin.email
+            self.certbot_ssl_config_path = build_paths.find(
+                "apache/conf/extra/httpd-ssl.conf"
+            ).tree_root_path(WORKSPACE)
+
+    @property
+    def config(self):
+        """The current configuration snapshot"""
+        return self.config_service.config
+
+    @property
+    def email(self) -> str:
+        """The admin email address registered with letsencrypt"""
+        return self.config.admin.email
 
     def create_certificate(
         self, domain: str, staging: bool = True, dry_run: bool = True
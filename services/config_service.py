@@ -2,15 +2,31 @@
 A module that allows users to read and update configuration settings.
 """
 
-from typing import Any, Dict, Optional, TypeVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    TypeVar,
+    get_args,
+)
 import copy
 import json
 import logging
-import yaml
-from pydantic import BaseModel
+import threading
+from pydantic import BaseModel, TypeAdapter
 
 
 from configuration.app import Config
+from configuration.config_diff import diff_config, is_under
+from configuration.json_patch import JsonPatchError, apply_patch, patched_fields
+from configuration.tree_nodes import AdminContext, FSTree
+from configuration.yaml_cache import cached_load, model_fingerprint, parse_yaml
 
 T = TypeVar("T")
 
@@ -21,14 +37,14 @@ logger = logging.getLogger(__name__)
 def load_yaml_config(file_path: str) -> Optional[dict]:
     """Load a YAML file"""
     with open(file_path, "r", encoding="utf-8") as file:
-        return yaml.safe_load(file)
+        return parse_yaml(file)
     return None
 
 
 def parse_yaml_config(file_path: str) -> Config:
     """Load configuration from a YAML file"""
     with open(file_path, "r", encoding="utf-8") as file:
-        config_data = yaml.safe_load(file)
+        config_data = parse_yaml(file)
     return Config(**config_data)
 
 
@@ -71,9 +87,88 @@ def merge_config(existing_config: BaseModel, update_dict: Dict[str, Any]) -> Bas
     return existing_config
 
 
+@lru_cache(maxsize=None)
+def field_adapter(model_class: type, name: str) -> TypeAdapter:
+    """A validator for a model field, built once per field"""
+    return TypeAdapter(model_class.model_fields[name].annotation)
+
+
+def field_model(annotation: Any) -> Optional[type]:
+    """The model class of a field annotated with a model or an optional model"""
+    for candidate in (annotation, *get_args(annotation)):
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+
+def validate_update(model_class: type, update_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a dictionary update against a model class without applying it.
+    Updates to nested models are validated field by field. Updates to tree nodes
+    are left as they are, since they are merged into a copy of the tree.
+
+    Args:
+        model_class: The class of the configuration object to be updated
+        update_dict: Dictionary containing updates
+
+    Returns:
+        The update with its values validated against their field types.
+    """
+    validated = {}
+    for key, value in (update_dict or {}).items():
+        field = model_class.model_fields.get(key)
+        if field is None:
+            logger.warning("Attribute %s does not exist in the configuration", key)
+            continue
+
+        nested_class = field_model(field.annotation)
+        if isinstance(value, dict) and nested_class is not None:
+            if issubclass(nested_class, FSTree):
+                validated[key] = value
+            else:
+                validated[key] = validate_update(nested_class, value)
+        else:
+            validated[key] = field_adapter(model_class, key).validate_python(value)
+    return validated
+
+
+def apply_update(config: T, validated_update: Dict[str, Any]) -> T:
+    """
+    Apply an update from validate_update to a copy of a configuration object. The
+    original is left untouched and shares every nested model the update does not
+    reach with the copy.
+
+    Args:
+        config: Original configuration object
+        validated_update: Dictionary returned by validate_update
+
+    Returns:
+        Updated configuration object
+    """
+    updates = {}
+    for key, value in validated_update.items():
+        current_value = getattr(config, key)
+        if isinstance(value, dict) and isinstance(current_value, FSTree):
+            # Tree nodes link back to their parents, so the subtree is copied whole
+            updates[key] = merge_config(copy.deepcopy(current_value), value)
+        elif isinstance(value, dict) and isinstance(current_value, BaseModel):
+            updates[key] = apply_update(current_value, value)
+        elif isinstance(value, dict) and field_model(
+            type(config).model_fields[key].annotation
+        ):
+            # A nested model that was unset is created from the update
+            updates[key] = field_adapter(type(config), key).validate_python(value)
+        else:
+            updates[key] = value
+
+    return config.model_copy(update=updates)
+
+
 def copy_merge_config(config: T, update_dict: Dict[str, Any]) -> T:
     """
-    Merge a configuration object with a dictionary update
+    Merge a dictionary update into a copy of a configuration object. The original
+    is left untouched and shares every nested model the update does not reach
+    with the copy. Updated values are validated against their field types.
 
     Args:
         config: Original configuration object
@@ -82,38 +177,225 @@ def copy_merge_config(config: T, update_dict: Dict[str, Any]) -> T:
     Returns:
         Updated configuration object
     """
-    # Create a deep copy to avoid modifying the original
-    merged_config = copy.deepcopy(config)
+    return apply_update(config, validate_update(type(config), update_dict))
 
-    for key, value in update_dict.items():
-        # Handle nested dictionaries recursively
-        if hasattr(merged_config, key):
-            current_value = getattr(merged_config, key)
-
-            # Recursive merge for nested objects
-            if isinstance(value, dict) and hasattr(current_value, "__dict__"):
-                nested_config = merge_config(current_value, value)
-                setattr(merged_config, key, nested_config)
-            else:
-                # Direct attribute update
-                setattr(merged_config, key, value)
 
-    return merged_config
+class ConfigSnapshot(NamedTuple):
+    """A configuration and the version number it was published as"""
+
+    version: int
+    config: Config
+
+
+@dataclass(frozen=True)
+class ConfigChangeEvent:
+    """A published configuration update and the paths it changed"""
+
+    old: ConfigSnapshot
+    new: ConfigSnapshot
+    paths: FrozenSet[str]
+
+    def under(self, prefix: str) -> FrozenSet[str]:
+        """The changed paths at or below prefix"""
+        return frozenset(path for path in self.paths if is_under(path, prefix))
+
+
+ConfigListener = Callable[[ConfigChangeEvent], None]
+
+
+class ConfigVersionConflict(Exception):
+    """An update was made against a configuration version that is not current"""
+
+    def __init__(self, expected: int, actual: int):
+        super().__init__(
+            f"Configuration version is {actual}, but the update expected {expected}"
+        )
+        self.expected = expected
+        self.actual = actual
 
 
 class ConfigService:
     """
     A service to provide configuration settings and configuration update
     functionality.
+
+    The configuration is published as a series of snapshots. Readers take the
+    current snapshot without locking and must treat it as read-only; updates
+    build a new snapshot with copy_merge_config and replace the current one.
     """
 
     def __init__(self, config: Config):
-        self.config = config
+        self._snapshot = ConfigSnapshot(0, config)
+        # Reentrant so listeners may update the configuration themselves
+        self._write_lock = threading.RLock()
+        self._listeners: List[tuple] = []
+
+    @property
+    def config(self) -> Config:
+        """The current configuration snapshot"""
+        return self._snapshot.config
+
+    @property
+    def version(self) -> int:
+        """The version of the current configuration snapshot"""
+        return self._snapshot.version
+
+    def snapshot(self) -> ConfigSnapshot:
+        """The current configuration together with its version"""
+        return self._snapshot
+
+    def subscribe(self, prefix: str, listener: ConfigListener) -> Callable[[], None]:
+        """
+        Call listener with each change event that changes a path at or below
+        prefix. An empty prefix matches every change. Listeners are called in
+        the order updates are published, on the updating thread.
+
+        Returns:
+            A function that removes the subscription.
+        """
+        subscription = (prefix, listener)
+        with self._write_lock:
+            self._listeners = self._listeners + [subscription]
+
+        def unsubscribe():
+            with self._write_lock:
+                self._listeners = [s for s in self._listeners if s is not subscription]
+
+        return unsubscribe
+
+    def update(
+        self, update_dict: Dict[str, Any], expected_version: Optional[int] = None
+    ) -> ConfigSnapshot:
+        """
+        Merge a dictionary update into a new configuration snapshot, publish it
+        and notify the listeners of the changed paths. An update that changes
+        nothing leaves the current snapshot in place.
+
+        Args:
+            update_dict: Dictionary containing updates
+            expected_version: If set, the version the update was made against
+
+        Returns:
+            The current snapshot.
+        """
+        return self.apply(validate_update(Config, update_dict), expected_version)
+
+    def update_many(
+        self, update_dicts: List[Dict[str, Any]], expected_version: Optional[int] = None
+    ) -> ConfigSnapshot:
+        """
+        Merge a batch of dictionary updates, in order, into a single new snapshot.
+        Either every update applies or none does, and listeners are notified once.
+
+        Args:
+            update_dicts: Dictionaries containing updates
+            expected_version: If set, the version the updates were made against
+
+        Returns:
+            The current snapshot.
+        """
+        validated = [validate_update(Config, update) for update in update_dicts]
+
+        def change(config: Config) -> Config:
+            for validated_update in validated:
+                config = apply_update(config, validated_update)
+            return config
+
+        return self.transform(change, expected_version)
+
+    def patch(
+        self, operations: List[Dict[str, Any]], expected_version: Optional[int] = None
+    ) -> ConfigSnapshot:
+        """
+        Apply a JSON Patch (RFC 6902) to the configuration as a single new
+        snapshot. Only the top level fields the patch touches are serialized,
+        patched and validated again.
+
+        Args:
+            operations: The JSON Patch operations
+            expected_version: If set, the version the patch was made against
+
+        Returns:
+            The current snapshot.
+        """
+        fields = patched_fields(operations)
+        unknown = [field for field in fields if field not in Config.model_fields]
+        if unknown:
+            raise JsonPatchError(f"Unknown fields: {', '.join(unknown)}")
+
+        def change(config: Config) -> Config:
+            document = {
+                field: config.model_dump(include={field})[field] for field in fields
+            }
+            patched = apply_patch(document, operations)
+            if set(patched) != set(fields):
+                raise JsonPatchError("Top level fields cannot be added or removed")
+            return config.model_copy(
+                update={
+                    field: field_adapter(Config, field).validate_python(patched[field])
+                    for field in fields
+                }
+            )
+
+        return self.transform(change, expected_version)
+
+    def apply(
+        self, validated_update: Dict[str, Any], expected_version: Optional[int] = None
+    ) -> ConfigSnapshot:
+        """
+        Publish a new snapshot with an update from validate_update applied, and
+        notify the listeners of the changed paths.
+
+        Args:
+            validated_update: Dictionary returned by validate_update
+            expected_version: If set, the version the update was made against
+
+        Returns:
+            The current snapshot.
+        """
+        return self.transform(
+            lambda config: apply_update(config, validated_update), expected_version
+        )
+
+    def transform(
+        self, change: Callable[[Config], Config], expected_version: Optional[int] = None
+    ) -> ConfigSnapshot:
+        """
+        Publish change(current config) as the next snapshot, and notify the
+        listeners of the changed paths. change must not modify its argument.
+
+        Raises:
+            ConfigVersionConflict: If expected_version is set and is not the
+                current version.
+        """
+        with self._write_lock:
+            current = self._snapshot
+            if expected_version is not None and expected_version != current.version:
+                raise ConfigVersionConflict(expected_version, current.version)
+            config = change(current.config)
+            paths = diff_config(current.config, config)
+            if not paths:
+                return current
+            self._snapshot = ConfigSnapshot(current.version + 1, config)
+            self.publish(ConfigChangeEvent(current, self._snapshot, frozenset(paths)))
+            return self._snapshot
+
+    def publish(self, event: ConfigChangeEvent):
+        """Notify the listeners whose prefix covers one of the changed paths"""
+        for prefix, listener in self._listeners:
+            if not event.under(prefix):
+                continue
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Configuration listener %s failed", listener)
 
     def load_yaml_config(self, file_path: str) -> Optional[dict]:
         """
         Load a configuration file. Merges changes with Config by overwriting
-        existing values and loading the yaml Config values in their place.
+        existing values and loading the yaml Config values in their place. The
+        parsed and validated file is cached beside it, so loading an unchanged
+        file again skips both steps.
 
         Args:
             file_path: The path to the configuration file.
@@ -121,8 +403,13 @@ class ConfigService:
         Returns:
             The loaded configuration dictionary.
         """
-        yaml_config = load_yaml_config(file_path)
-        merge_config(self.config, yaml_config)
+        yaml_config, update = cached_load(
+            file_path,
+            "config",
+            lambda data: (data, validate_update(Config, data)),
+            model_fingerprint(Config),
+        )
+        self.apply(update)
         return yaml_config
 
     def load_json_config(self, json_str: str) -> Optional[dict]:
@@ -137,5 +424,20 @@ class ConfigService:
             The loaded configuration dictionary.
         """
         json_config = load_json_config(json_str)
-        merge_config(self.config, json_config)
+        self.update(json_config)
         return json_config
+
+
+def create_config_service() -> ConfigService:
+    """
+    Creates a ConfigService object.
+    """
+
+    config = Config(
+        admin=AdminContext(
+            domain="example.com",
+            email="admin@example.com",
+        )
+    )
+
+    return ConfigService(config=config)
@@ -16,8 +16,8 @@ class GitService:
     def __init__(self, config_service: ConfigService):
         self.config_service = config_service
         self.build_paths = config_service.config.build_paths
-        self.git_repos_path = (
-            self.build_paths.get("apache").get("git").tree_root_path(WORKSPACE)
+        self.git_repos_path = self.build_paths.find("apache/git").tree_root_path(
+            WORKSPACE
         )
 
     def create_bare_repo(self, repo_name):
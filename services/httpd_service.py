@@ -23,63 +23,26 @@ class HttpdService:
         self.podman_service = podman_service
 
         self.build_paths = config_service.config.build_paths
-        self.webroot_path = self.build_paths.get("webroot").tree_root_path(WORKSPACE)
-        self.cgi_path = self.build_paths.get("cgi").tree_root_path(WORKSPACE)
-        self.httpd_config_path = (
-            config_service.config.build_paths.get("apache")
-            .get("conf")
-            .get("httpd.conf")
-            .tree_root_path(WORKSPACE)
-        )
-        self.ssl_config_path = (
-            config_service.config.build_paths.get("apache")
-            .get("conf")
-            .get("extra")
-            .get("httpd-ssl.conf")
-            .tree_root_path(WORKSPACE)
-        )
-        self.ssl_self_signed_cert_path = (
-            config_service.config.build_paths.get("apache")
-            .get("conf")
-            .get("ssl")
-            .tree_root_path(WORKSPACE)
-        )
-        self.letsencrypt_path = (
-            config_service.config.build_paths.get("apache")
-            .get("conf")
-            .get("letsencrypt")
-            .tree_root_path(WORKSPACE)
-        )
-        self.scripts_path = (
-            config_service.config.build_paths.get("apache")
-            .get("scripts")
-            .tree_root_path(WORKSPACE)
-        )
-        self.git_repos_path = (
-            config_service.config.build_paths.get("apache")
-            .get("git")
-            .tree_root_path(WORKSPACE)
-        )
-        self.git_auth_path = (
-            config_service.config.build_paths.get("secrets")
-            .get("git-auth")
-            .tree_root_path(WORKSPACE)
-        )
-        self.gitweb_config_path = (
-            config_service.config.build_paths.get("apache")
-            .get("conf")
-            .get("extra")
-            .get("gitweb.conf")
-            .tree_root_path(WORKSPACE)
-        )
-        self.apache_path = config_service.config.build_paths.get(
-            "apache"
-        ).tree_root_path(WORKSPACE)
-        self.apache_dockefile = (
-            config_service.config.build_paths.get("apache")
-            .get("Dockerfile")
-            .tree_root_path(WORKSPACE)
-        )
+        self.webroot_path = self.build_path("webroot")
+        self.cgi_path = self.build_path("cgi")
+        self.httpd_config_path = self.build_path("apache/conf/httpd.conf")
+        self.ssl_config_path = self.build_path("apache/conf/extra/httpd-ssl.conf")
+        self.ssl_self_signed_cert_path = self.build_path("apache/conf/ssl")
+        self.letsencrypt_path = self.build_path("apache/conf/letsencrypt")
+        self.scripts_path = self.build_path("apache/scripts")
+        self.git_repos_path = self.build_path("apache/git")
+        self.git_auth_path = self.build_path("secrets/git-auth")
+        self.gitweb_config_path = self.build_path("apache/conf/extra/gitweb.conf")
+        self.apache_path = self.build_path("apache")
+        self.apache_dockefile = self.build_path("apache/Dockerfile")
+
+    def build_path(self, path: str) -> str:
+        """
+        Get the absolute path of a node in the build tree.
+
+        This method resolves a slash separated path of node names, e.g. apache/conf/httpd.conf.
+        """
+        return self.build_paths.find(path).tree_root_path(WORKSPACE)
 
     def run_container(self, image: str, name: str) -> Container:
         """
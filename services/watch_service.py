@@ -0,0 +1,161 @@
+"""
+A service that watches templates and configuration for changes, re-renders the
+affected parts of the build tree and gracefully reloads the httpd container.
+"""
+
+import logging
+import os
+from typing import TYPE_CHECKING, Iterable, List, Optional, Set, Tuple
+from watchfiles import Change, watch
+from configuration.config_diff import diff_config
+from configuration.manifest import RenderManifest
+from configuration.templates import template_closure
+from configuration.tree_nodes import TemplateTree
+from configuration.tree_walker import IncrementalTreeRenderer, iter_tree
+from services.config_service import ConfigService
+from services.httpd_service import DEFAULT_CONTAINER_NAME, HttpdService
+
+if TYPE_CHECKING:
+    from web.ws_hub import WebSocketHub
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = "secrets/config.yaml"
+
+# Milliseconds to wait for a burst of file events to settle before rendering
+DEBOUNCE_MS = 50
+
+
+class WatchService:
+    """
+    Watches templates and the configuration file, and on each burst of changes
+    re-renders only the TemplateTree nodes that use a changed template or read a
+    changed configuration value, then gracefully reloads the httpd container once
+    if any rendered file changed.
+    """
+
+    def __init__(
+        self,
+        config_service: ConfigService,
+        httpd_service: HttpdService,
+        config_path: str = CONFIG_PATH,
+        container_name: str = DEFAULT_CONTAINER_NAME,
+        hub: Optional["WebSocketHub"] = None,
+    ):
+        self.config_service = config_service
+        self.httpd_service = httpd_service
+        self.config_path = os.path.abspath(config_path)
+        self.container_name = container_name
+        # Receives render and reload results, if set
+        self.hub = hub
+
+    def template_root(self) -> str:
+        """The absolute path of the template directory"""
+        return os.path.abspath(self.config_service.config.build.template_root)
+
+    def template_nodes(self) -> List[TemplateTree]:
+        """All TemplateTree nodes of the build tree"""
+        build_paths = self.config_service.config.build_paths
+        return [
+            node for node in iter_tree(build_paths) if isinstance(node, TemplateTree)
+        ]
+
+    def affected_nodes(
+        self,
+        changes: Iterable[Tuple[Change, str]],
+        config_paths: Iterable[str] = (),
+        manifest: Optional[RenderManifest] = None,
+    ) -> List[TemplateTree]:
+        """
+        Find the template nodes affected by a set of file changes and changed
+        configuration paths. A change to a template affects the nodes that render
+        it or pull it in. A configuration change affects the nodes the manifest
+        records as reading a changed path, or every node without a manifest.
+        """
+        paths = {os.path.abspath(path) for _, path in changes}
+        config_paths = set(config_paths)
+        dependents = None
+        if config_paths and manifest is not None:
+            dependents = manifest.dependents(config_paths)
+
+        template_root = self.template_root()
+        affected = []
+        for node in self.template_nodes():
+            if config_paths and (
+                dependents is None or node.tree_root_path("") in dependents
+            ):
+                affected.append(node)
+                continue
+            closure = template_closure(template_root, node.template_path)
+            if any(os.path.join(template_root, name) in paths for name in closure):
+                affected.append(node)
+        return affected
+
+    def reload_config(self) -> Set[str]:
+        """Reload the configuration file, returning the paths that changed"""
+        if not os.path.exists(self.config_path):
+            return set()
+        old_config = self.config_service.config
+        self.config_service.load_yaml_config(self.config_path)
+        return diff_config(old_config, self.config_service.config)
+
+    def handle_changes(self, changes: Set[Tuple[Change, str]]) -> List[str]:
+        """
+        Re-render the nodes affected by a burst of changes, and reload the httpd
+        configuration once if any file was rewritten.
+
+        Returns the paths of the rewritten files.
+        """
+        config_paths = set()
+        if self.config_path in {os.path.abspath(path) for _, path in changes}:
+            config_paths = self.reload_config()
+
+        config = self.config_service.config
+        renderer = IncrementalTreeRenderer()
+        renderer.open_manifest(config.build_paths, config)
+        try:
+            nodes = self.affected_nodes(changes, config_paths, renderer.manifest)
+            for node in nodes:
+                renderer.process_node(node, config)
+        finally:
+            changed = renderer.changed
+            renderer.close_manifest()
+
+        if changed:
+            logger.info("Re-rendered %s", ", ".join(changed))
+            if self.hub is not None:
+                self.hub.publish("render", {"changed": changed})
+            self.reload()
+        return changed
+
+    def reload(self) -> Optional[str]:
+        """Gracefully reload the httpd container, if it is running"""
+        container_id = self.httpd_service.get_container_id(self.container_name)
+        if container_id is None:
+            return None
+        self.httpd_service.reload_configuration(container_id)
+        if self.hub is not None:
+            self.hub.publish("reload", {"container_id": container_id})
+        return container_id
+
+    def is_watched(self, change: Change, path: str) -> bool:
+        """Filter file events down to templates and the configuration file"""
+        path = os.path.abspath(path)
+        return path == self.config_path or path.startswith(
+            self.template_root() + os.sep
+        )
+
+    def run(self, stop_event=None):
+        """
+        Watch for changes until interrupted or stop_event is set.
+        """
+        paths = [self.template_root(), os.path.dirname(self.config_path)]
+        logger.info("Watching %s", ", ".join(paths))
+        for changes in watch(
+            *[path for path in paths if os.path.isdir(path)],
+            watch_filter=self.is_watched,
+            debounce=DEBOUNCE_MS,
+            stop_event=stop_event,
+        ):
+            self.handle_changes(changes)
@@ -0,0 +1,24 @@
+"""
+Test that the actions CLI defers its imports
+"""
+
+import subprocess
+import sys
+
+HEAVY_MODULES = ["uvicorn", "IPython", "certbot", "podman", "git", "fastapi"]
+
+
+def test_actions_import_is_lazy():
+    code = (
+        "import sys, actions.build\n"
+        "print(actions.build.list_functions())\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    functions, loaded = result.stdout.splitlines()
+    assert loaded == "[]"
+    assert "render" in functions
+    assert "import_report" in functions
+    assert "_config_service" not in functions
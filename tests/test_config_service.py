@@ -0,0 +1,142 @@
+"""
+Test copy-on-write configuration snapshots
+"""
+
+import os
+import threading
+import pytest
+from pydantic import ValidationError
+from configuration.app import Config, AdminContext, HttpReverseProxy
+from configuration import yaml_cache
+from configuration.config_diff import diff_config
+from services.config_service import ConfigService, copy_merge_config
+
+
+def make_config() -> Config:
+    return Config(admin=AdminContext(domain="example.com", email="admin@example.com"))
+
+
+def test_copy_merge_shares_unchanged_models():
+    config = make_config()
+    merged = copy_merge_config(config, {"admin": {"domain": "new.example.com"}})
+
+    assert merged.admin.domain == "new.example.com"
+    assert config.admin.domain == "example.com"
+    assert merged.admin.email == "admin@example.com"
+    assert merged.podman is config.podman
+    assert merged.build_paths is config.build_paths
+
+
+def test_copy_merge_validates_leaves():
+    config = make_config()
+    merged = copy_merge_config(
+        config, {"proxies": [{"url": "/api", "backend": "http://localhost:8080"}]}
+    )
+    assert merged.proxies == [
+        HttpReverseProxy(url="/api", backend="http://localhost:8080")
+    ]
+    with pytest.raises(ValidationError):
+        copy_merge_config(config, {"podman": {"timeout": "soon"}})
+
+
+def test_copy_merge_copies_updated_trees():
+    config = make_config()
+    merged = copy_merge_config(config, {"container_paths": {"name": "renamed"}})
+    assert merged.container_paths.name == "renamed"
+    assert config.container_paths.name != "renamed"
+    assert merged.build_paths is config.build_paths
+
+
+def test_update_publishes_new_snapshot():
+    config_service = ConfigService(make_config())
+    before = config_service.snapshot()
+
+    after = config_service.update({"admin": {"email": "root@example.com"}})
+    assert after.version == before.version + 1
+    assert config_service.config is after.config
+    assert before.config.admin.email == "admin@example.com"
+    assert config_service.config.admin.email == "root@example.com"
+
+
+def test_concurrent_updates_are_not_lost():
+    config_service = ConfigService(make_config())
+
+    def update_port(start: int):
+        for i in range(start, start + 50):
+            snapshot = config_service.snapshot()
+            assert snapshot.config.admin.domain == "example.com"
+            config_service.update({"imap": {"port": i}})
+
+    threads = [threading.Thread(target=update_port, args=(i * 50,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert config_service.version == 200
+
+
+def test_diff_config_paths():
+    config = make_config()
+    config = copy_merge_config(
+        config,
+        {"proxies": [{"url": f"/app{i}", "backend": "http://a"} for i in range(4)]},
+    )
+    proxies = [proxy.model_dump() for proxy in config.proxies]
+    proxies[3]["backend"] = "http://b"
+    merged = copy_merge_config(
+        config, {"admin": {"domain": "new.example.com"}, "proxies": proxies}
+    )
+    assert diff_config(config, merged) == {"admin.domain", "proxies[3].backend"}
+    assert diff_config(config, config) == set()
+
+    renamed = copy_merge_config(config, {"container_paths": {"name": "renamed"}})
+    assert diff_config(config, renamed) == {"container_paths.name"}
+
+
+def test_subscribe_by_prefix():
+    config_service = ConfigService(make_config())
+    admin_events, proxy_events = [], []
+    config_service.subscribe("admin", admin_events.append)
+    unsubscribe = config_service.subscribe("proxies", proxy_events.append)
+
+    config_service.update({"admin": {"email": "root@example.com"}})
+    assert len(admin_events) == 1
+    assert admin_events[0].paths == {"admin.email"}
+    assert admin_events[0].new.version == 1
+    assert proxy_events == []
+
+    config_service.update({"proxies": [{"url": "/api", "backend": "http://a"}]})
+    assert proxy_events[0].paths == {"proxies[0]"}
+
+    # Updates that change nothing publish neither a snapshot nor an event
+    unsubscribe()
+    snapshot = config_service.snapshot()
+    assert config_service.update({"admin": {"email": "root@example.com"}}) is snapshot
+    config_service.update({"proxies": []})
+    assert len(admin_events) == 1 and len(proxy_events) == 1
+
+
+def test_load_yaml_config_uses_cache(tmp_path, monkeypatch):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        "admin:\n  email: root@example.com\n"
+        "proxies:\n  - url: /app\n    backend: http://localhost:8080\n"
+    )
+    ConfigService(make_config()).load_yaml_config(str(config_file))
+    cache = tmp_path / ".config.yaml.config.cache"
+    assert os.stat(cache).st_mode & 0o777 == 0o600
+
+    def fail(data):
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr(yaml_cache, "parse_yaml", fail)
+    config_service = ConfigService(make_config())
+    config_service.load_yaml_config(str(config_file))
+    assert config_service.config.admin.email == "root@example.com"
+    assert config_service.config.proxies[0].backend == "http://localhost:8080"
+
+    # Editing the file invalidates the cache
+    monkeypatch.undo()
+    config_file.write_text("admin:\n  email: other@example.com\n")
+    config_service.load_yaml_config(str(config_file))
+    assert config_service.config.admin.email == "other@example.com"
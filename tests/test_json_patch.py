@@ -0,0 +1,40 @@
+"""
+Test the JSON Patch implementation
+"""
+
+import pytest
+from configuration.json_patch import JsonPatchError, JsonPatchTestFailed, apply_patch
+
+
+def test_apply_patch_operations():
+    document = {"a": {"b": [1, 2, 3]}, "c": "x"}
+    patched = apply_patch(
+        document,
+        [
+            {"op": "add", "path": "/a/b/1", "value": 9},
+            {"op": "remove", "path": "/a/b/0"},
+            {"op": "replace", "path": "/c", "value": "y"},
+            {"op": "copy", "from": "/c", "path": "/d"},
+            {"op": "move", "from": "/a/b", "path": "/e"},
+            {"op": "add", "path": "/e/-", "value": 4},
+            {"op": "add", "path": "/f~1g", "value": True},
+            {"op": "test", "path": "/e", "value": [9, 2, 3, 4]},
+        ],
+    )
+    assert patched == {"a": {}, "c": "y", "d": "y", "e": [9, 2, 3, 4], "f/g": True}
+    # The original document is left untouched
+    assert document == {"a": {"b": [1, 2, 3]}, "c": "x"}
+
+
+def test_apply_patch_errors():
+    document = {"a": [1]}
+    with pytest.raises(JsonPatchTestFailed):
+        apply_patch(document, [{"op": "test", "path": "/a/0", "value": 2}])
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [{"op": "remove", "path": "/b"}])
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [{"op": "replace", "path": "/a/5", "value": 1}])
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [{"op": "move", "from": "/a", "path": "/a/0"}])
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [{"op": "frobnicate", "path": "/a"}])
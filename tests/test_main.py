@@ -85,3 +85,85 @@ def test_partial_config_updates():
 
     response = client.get("/config")
     assert response.status_code == 200
+
+
+def test_config_conditional_get():
+    response = client.get("/config")
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    not_modified = client.get("/config", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.content == b""
+
+    client.patch("/config", json={"admin": {"domain": "etag.example.com"}})
+    modified = client.get("/config", headers={"If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.headers["etag"] != etag
+    assert modified.json()["admin"]["domain"] == "etag.example.com"
+
+
+def test_config_field_selection():
+    response = client.get("/config", params={"fields": "proxies,admin"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"admin", "proxies"}
+    assert response.headers["etag"] != client.get("/config").headers["etag"]
+
+    assert client.get("/config", params={"fields": "nope"}).status_code == 400
+
+
+def test_config_json_patch_requires_if_match():
+    etag = client.get("/config").headers["etag"]
+    patch = [
+        {"op": "add", "path": "/proxies/-", "value": {"url": "/a", "backend": "b"}},
+        {"op": "add", "path": "/proxies/-", "value": {"url": "/c", "backend": "d"}},
+    ]
+    headers = {"Content-Type": "application/json-patch+json"}
+    assert client.patch("/config", json=patch, headers=headers).status_code == 428
+
+    response = client.patch(
+        "/config", json=patch, headers={**headers, "If-Match": etag}
+    )
+    assert response.status_code == 200
+    version = response.json()["version"]
+    assert [p["url"] for p in client.get("/config").json()["proxies"][-2:]] == [
+        "/a",
+        "/c",
+    ]
+
+    # The same patch against the old version is rejected
+    stale = client.patch("/config", json=patch, headers={**headers, "If-Match": etag})
+    assert stale.status_code == 412
+
+    failed_test = [{"op": "test", "path": "/admin/domain", "value": "other"}]
+    response = client.patch(
+        "/config",
+        json=failed_test,
+        headers={**headers, "If-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 409
+    assert client.get("/config").headers["etag"].split("-")[1] == str(version)
+
+
+def test_config_batch_merge():
+    etag = client.get("/config").headers["etag"]
+    batch = [
+        {"admin": {"domain": "batch.example.com"}},
+        {"imap": {"port": 2143}},
+    ]
+    assert client.patch("/config", json=batch).status_code == 428
+    response = client.patch("/config", json=batch, headers={"If-Match": etag})
+    assert response.status_code == 200
+    config = client.get("/config").json()
+    assert config["admin"]["domain"] == "batch.example.com"
+    assert config["imap"]["port"] == 2143
+
+    # A batch with an invalid update applies nothing
+    version = response.json()["version"]
+    bad_batch = [{"imap": {"port": 3143}}, {"imap": {"port": "not a port"}}]
+    response = client.patch(
+        "/config", json=bad_batch, headers={"If-Match": f'"{version}"'}
+    )
+    assert response.status_code == 400
+    assert client.get("/config").json()["imap"]["port"] == 2143
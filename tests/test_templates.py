@@ -0,0 +1,88 @@
+"""
+Test the shared template environments
+"""
+
+import os
+from configuration.app import WORKSPACE
+from configuration.files import atomic_write_chunks
+from configuration.templates import (
+    get_environment,
+    precompile_templates,
+    referenced_names,
+    template_closure,
+)
+
+TEMPLATE_ROOT = f"{WORKSPACE}/templates"
+
+
+def test_environment_is_shared():
+    env = get_environment(TEMPLATE_ROOT)
+    assert get_environment(TEMPLATE_ROOT) is env
+    template = env.get_template("httpd-ssl.conf")
+    assert env.get_template("httpd-ssl.conf") is template
+
+
+def test_referenced_names():
+    names = referenced_names(TEMPLATE_ROOT, "httpd-ssl.conf")
+    assert {"domain", "email", "proxies"} <= names
+
+
+def test_precompiled_templates_render_the_same(tmp_path):
+    target = precompile_templates(TEMPLATE_ROOT, str(tmp_path / "compiled"))
+    assert any(name.endswith(".py") for name in os.listdir(target))
+
+    compiled = get_environment(TEMPLATE_ROOT, target)
+    assert compiled is not get_environment(TEMPLATE_ROOT)
+    kwargs = {"email": "admin@example.com", "domain": "example.com", "proxies": []}
+    expected = (
+        get_environment(TEMPLATE_ROOT).get_template("httpd.conf").render(**kwargs)
+    )
+    assert compiled.get_template("httpd.conf").render(**kwargs) == expected
+
+
+def test_compiled_templates_fall_back_to_edited_source(tmp_path):
+    template_root = tmp_path / "templates"
+    template_root.mkdir()
+    source = template_root / "page.conf"
+    source.write_text("v1 {{ x }}")
+    target = precompile_templates(str(template_root), str(tmp_path / "compiled"))
+
+    env = get_environment(str(template_root), target)
+    assert env.get_template("page.conf").render(x=1) == "v1 1"
+
+    source.write_text("v2 {{ x }}")
+    stat = os.stat(target)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert env.get_template("page.conf").render(x=1) == "v2 1"
+
+
+def test_template_closure():
+    closure = template_closure(TEMPLATE_ROOT, "web/homepage.html")
+    assert "web/homepage.html" in closure
+    assert "web/base.html" in closure
+
+
+def test_atomic_write_chunks(tmp_path):
+    target = str(tmp_path / "out.conf")
+    assert atomic_write_chunks(target, iter(["a" * 10, "b"]), 0o100640)
+    with open(target) as file:
+        assert file.read() == "a" * 10 + "b"
+    assert os.stat(target).st_mode & 0o777 == 0o640
+
+    # Identical content leaves the file alone
+    mtime = os.stat(target).st_mtime_ns
+    assert not atomic_write_chunks(target, iter(["a" * 10 + "b"]))
+    assert os.stat(target).st_mtime_ns == mtime
+
+    def failing():
+        yield "partial"
+        raise RuntimeError("render failed")
+
+    # A failed render leaves the previous file and no temporary files behind
+    try:
+        atomic_write_chunks(target, failing())
+    except RuntimeError:
+        pass
+    with open(target) as file:
+        assert file.read() == "a" * 10 + "b"
+    assert os.listdir(tmp_path) == ["out.conf"]
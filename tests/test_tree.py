@@ -1,5 +1,6 @@
 import os
 from configuration.tree_nodes import (
+    FSTree,
     build_tree,
     container_paths,
 )
@@ -47,3 +48,44 @@ def test_schema_dump():
     schema = build_tree.model_json_schema()
     assert schema["$defs"]["FSTree"]["description"] == "A tree of build artifacts"
     assert "build" == build_tree.name
+
+
+def test_find():
+    ssl_conf = build_tree.get("apache").get("conf").get("extra").get("httpd-ssl.conf")
+    assert build_tree.find("apache/conf/extra/httpd-ssl.conf") is ssl_conf
+    assert build_tree.find("apache.conf.extra.httpd-ssl.conf") is ssl_conf
+    assert build_tree.get("apache").find("conf/extra/httpd-ssl.conf") is ssl_conf
+    assert build_tree.find("apache/missing") is None
+    assert build_tree.get("apache").get("conf/extra") is None
+
+
+def test_index_invalidation():
+    leaf = FSTree(name="leaf", isDir=False)
+    tree = FSTree(name="root", children=[FSTree(name="a", children=[leaf])])
+    assert tree.find("a/leaf") is leaf
+    assert leaf.tree_root_path("/srv") == "/srv/root/a/leaf"
+
+    # Renaming a directory re-keys its subtree
+    tree.get("a").name = "b"
+    tree.get("b").path = "b"
+    assert tree.find("a/leaf") is None
+    assert tree.find("b/leaf") is leaf
+    assert leaf.tree_root_path("/srv") == "/srv/root/b/leaf"
+
+    # Moving a node re-parents it and updates both trees
+    other = FSTree(name="other")
+    other.children = [leaf]
+    assert other.find("leaf") is leaf
+    assert leaf.tree_root_path("/srv") == "/srv/other/leaf"
+    assert tree.find("b/leaf") is None
+    assert tree.get("b").children == []
+
+
+def test_deep_tree_construction():
+    depth = 2000
+    node = FSTree(name="leaf")
+    for i in range(depth):
+        node = FSTree(name=f"n{i}", children=[node])
+    leaf = node.find("/".join(f"n{i}" for i in reversed(range(depth - 1))) + "/leaf")
+    assert leaf.root() is node
+    assert leaf.tree_root_path("").count("/") == depth
@@ -0,0 +1,64 @@
+"""
+Test dry-run planning of renders and removals
+"""
+
+import json
+import os
+from configuration.app import Config, AdminContext, BuildContext, WORKSPACE
+from configuration.tree_nodes import build_tree
+from configuration.tree_plan import (
+    CERT,
+    MKDIR,
+    REMOVE,
+    WRITE,
+    RemovalPlanner,
+    RenderPlanner,
+)
+from configuration.tree_walker import IncrementalTreeRenderer
+
+
+def plan_config(build_root: str) -> Config:
+    return Config(
+        admin=AdminContext(domain="example.com", email="admin@example.com"),
+        build=BuildContext(
+            build_root=build_root, template_root=f"{WORKSPACE}/templates"
+        ),
+    )
+
+
+def test_render_plan_does_not_touch_disk(tmp_path):
+    config = plan_config(str(tmp_path))
+    plan = RenderPlanner().plan(build_tree, config)
+
+    assert os.listdir(tmp_path) == []
+    actions = {operation.action for operation in plan.operations}
+    assert {MKDIR, WRITE, CERT} <= actions
+    httpd_conf = build_tree.find("apache/conf/httpd.conf").tree_root_path(str(tmp_path))
+    write = next(op for op in plan.operations if op.path == httpd_conf)
+    assert write.size > 0 and write.size_delta == write.size
+    assert json.loads(plan.to_json())[0]["action"] == MKDIR
+
+
+def test_render_plan_after_render(tmp_path):
+    config = plan_config(str(tmp_path))
+    IncrementalTreeRenderer().walk(build_tree, config)
+    assert len(RenderPlanner().plan(build_tree, config)) == 0
+    assert str(RenderPlanner().plan(build_tree, config)) == "No changes"
+
+    config.admin.email = "someone.else@example.com"
+    plan = RenderPlanner().plan(build_tree, config)
+    httpd_conf = build_tree.find("apache/conf/httpd.conf").tree_root_path(str(tmp_path))
+    assert httpd_conf in [op.path for op in plan.operations]
+    assert all(op.action == WRITE for op in plan.operations)
+
+    plan.apply(config)
+    assert len(RenderPlanner().plan(build_tree, config)) == 0
+
+
+def test_removal_plan(tmp_path):
+    config = plan_config(str(tmp_path))
+    IncrementalTreeRenderer().walk(build_tree, config)
+    plan = RemovalPlanner().plan(build_tree, config)
+    assert plan.operations[-1].action == REMOVE
+    assert plan.operations[-1].path == build_tree.tree_root_path(str(tmp_path))
+    assert os.path.exists(plan.operations[-1].path)
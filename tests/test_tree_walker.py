@@ -2,9 +2,19 @@
 Test the tree walker
 """
 
-from configuration.tree_walker import TreeWalker, TreeRenderer, TreeRemoval
-from configuration.tree_nodes import build_tree
-from configuration.app import Config, AdminContext
+import os
+import sys
+from configuration.tree_walker import (
+    TreeWalker,
+    TreeRenderer,
+    TreeRemoval,
+    TreePrinter,
+    IncrementalTreeRenderer,
+    ParallelTreeRenderer,
+)
+from configuration.tree_nodes import FSTree, TemplateTree, build_tree
+from configuration.app import Config, AdminContext, BuildContext, WORKSPACE
+from configuration.manifest import RenderManifest
 
 TREE_SIZE = 31
 
@@ -37,3 +47,216 @@ def test_tree_removal():
     config = Config(admin=AdminContext(domain="example.com", email="admin@example.com"))
     results = walker.depth_first(build_tree, config)
     assert len(results) == TREE_SIZE
+
+
+def incremental_config(build_root: str) -> Config:
+    return Config(
+        admin=AdminContext(domain="example.com", email="admin@example.com"),
+        build=BuildContext(
+            build_root=build_root, template_root=f"{WORKSPACE}/templates"
+        ),
+    )
+
+
+def test_incremental_renderer(tmp_path):
+    config = incremental_config(str(tmp_path))
+    walker = IncrementalTreeRenderer()
+    results = walker.walk(build_tree, config)
+    assert len(results) == TREE_SIZE
+    assert len(walker.changed) > 0
+
+    httpd_conf = build_tree.get("apache").get("conf").get("httpd.conf")
+    abs_path = httpd_conf.tree_root_path(str(tmp_path))
+    mtime = os.stat(abs_path).st_mtime_ns
+
+    # Nothing changed, so nothing is rewritten
+    walker.walk(build_tree, config)
+    assert walker.changed == []
+    assert os.stat(abs_path).st_mtime_ns == mtime
+
+    # Changing a value only re-renders the templates that use it
+    config.admin.email = "other@example.com"
+    walker.walk(build_tree, config)
+    assert abs_path in walker.changed
+    cert_path = build_tree.get("apache").get("conf").get("ssl")
+    assert cert_path.tree_root_path(str(tmp_path)) not in walker.changed
+
+
+def test_incremental_renderer_repairs_outputs(tmp_path):
+    config = incremental_config(str(tmp_path))
+    walker = IncrementalTreeRenderer()
+    walker.walk(build_tree, config)
+
+    httpd_conf = build_tree.get("apache").get("conf").get("httpd.conf")
+    abs_path = httpd_conf.tree_root_path(str(tmp_path))
+    with open(abs_path, "w") as file:
+        file.write("edited by hand")
+
+    walker.walk(build_tree, config)
+    assert walker.changed == [abs_path]
+
+
+def test_parallel_renderer_matches_serial_order(tmp_path):
+    config = incremental_config(str(tmp_path))
+    serial = TreeRenderer().walk(build_tree, config)
+    parallel = ParallelTreeRenderer(max_threads=4, max_processes=2).walk(
+        build_tree, config
+    )
+    assert parallel == serial
+
+    ssl = build_tree.get("apache").get("conf").get("ssl")
+    assert os.path.getsize(f"{ssl.tree_root_path(str(tmp_path))}/server-key.pem") > 0
+
+
+def test_parallel_renderer_is_incremental(tmp_path):
+    config = incremental_config(str(tmp_path))
+    walker = ParallelTreeRenderer(max_threads=4, max_processes=2)
+    walker.walk(build_tree, config)
+    assert len(walker.changed) > 0
+
+    walker.walk(build_tree, config)
+    assert walker.changed == []
+    assert IncrementalTreeRenderer().walk(build_tree, config) == walker.walk(
+        build_tree, config
+    )
+
+
+def test_input_digest_covers_included_templates(tmp_path):
+    template_root = tmp_path / "templates"
+    template_root.mkdir()
+    (template_root / "page.conf").write_text('{% include "part.conf" %}')
+    (template_root / "part.conf").write_text("{{ domain }}")
+    node = TemplateTree(name="page.conf", template_path="page.conf")
+
+    before = node.input_digest(str(tmp_path), str(template_root), domain="a")
+    assert node.input_digest(str(tmp_path), str(template_root), domain="b") != before
+    (template_root / "part.conf").write_text("changed {{ domain }}")
+    assert node.input_digest(str(tmp_path), str(template_root), domain="a") != before
+
+
+def test_iter_walk_order_and_pruning():
+    tree = FSTree(
+        name="root",
+        children=[
+            FSTree(name="a", children=[FSTree(name="a1"), FSTree(name="a2")]),
+            FSTree(name="b"),
+        ],
+    )
+    config = Config(admin=AdminContext(domain="example.com", email="admin@example.com"))
+    walker = TreeWalker()
+
+    pre = [node.name for node, _ in walker.iter_walk(tree, config)]
+    assert pre == ["root", "a", "a1", "a2", "b"]
+    post = [node.name for node, _ in walker.iter_walk(tree, config, post_order=True)]
+    assert post == ["a1", "a2", "a", "b", "root"]
+
+    pruned = walker.iter_walk(tree, config, prune=lambda node: node.name == "a")
+    assert [node.name for node, _ in pruned] == ["root", "b"]
+
+    walk = walker.iter_walk(tree, config)
+    assert next(walk)[0] is tree
+    walk.close()
+
+
+def test_walk_deep_tree():
+    depth = 5 * sys.getrecursionlimit()
+    node = FSTree(name="leaf")
+    for i in range(depth):
+        node = FSTree(name=f"n{i}", children=[node])
+    config = Config(admin=AdminContext(domain="example.com", email="admin@example.com"))
+    assert len(TreeWalker().walk(node, config)) == depth + 1
+    assert len(TreeWalker().depth_first(node, config)) == depth + 1
+
+
+class ReportTree(TemplateTree):
+    """A TemplateTree subclass"""
+
+
+class ArchiveTree(FSTree):
+    """A third party node type"""
+
+
+class ArchiveWalker(TreeWalker):
+    def on_fs_tree(self, node, context):
+        return ("fs", node.name)
+
+    def on_template_tree(self, node, context):
+        return ("template", node.name)
+
+    def on_archive(self, node, context):
+        return ("archive", node.name)
+
+
+def test_dispatch_honors_mro_and_registration():
+    config = Config(admin=AdminContext(domain="example.com", email="admin@example.com"))
+    walker = ArchiveWalker()
+    report = ReportTree(name="report", template_path="report")
+    archive = ArchiveTree(name="archive")
+
+    assert walker.process_node(report, config) == ("template", "report")
+    assert walker.process_node(archive, config) == ("fs", "archive")
+
+    TreeWalker.register_node_type(ArchiveTree, "on_archive")
+    assert walker.process_node(archive, config) == ("archive", "archive")
+    # Walkers without the handler fall back through the MRO to default
+    assert TreeRemoval.resolve_handler(ArchiveTree) is TreeRemoval.default
+    assert TreePrinter.resolve_handler(ArchiveTree) is TreePrinter.on_fs_tree
+
+
+def test_render_context_is_lazy_and_sliced():
+    config = incremental_config("build")
+    render_context = config.render_context()
+    assert dict(render_context) == {
+        **config.admin.model_dump(),
+        **config.build.model_dump(),
+        **config.model_dump(),
+    }
+
+    render_context = config.render_context()
+    kwargs = render_context.for_template("httpd.conf")
+    assert kwargs["email"] == "admin@example.com"
+    assert kwargs["build_root"] == "build"
+    assert "build_paths" not in kwargs
+    # The FSTrees are never dumped for a template that does not use them
+    assert "build_paths" not in render_context._values
+
+
+def test_render_context_shared_across_walk(tmp_path):
+    walker = IncrementalTreeRenderer()
+    config = incremental_config(str(tmp_path))
+    walker.walk(build_tree, config)
+    render_context = walker._render_context
+    assert render_context.config is config
+    node = build_tree.find("apache/conf/httpd.conf")
+    walker.template_kwargs(node, config)
+    assert walker._render_context is render_context
+
+
+def test_manifest_records_template_dependencies(tmp_path):
+    config = incremental_config(str(tmp_path))
+    IncrementalTreeRenderer().walk(build_tree, config)
+    manifest = RenderManifest.load(
+        os.path.join(
+            build_tree.tree_root_path(str(tmp_path)),
+            IncrementalTreeRenderer.manifest_name,
+        )
+    )
+
+    def templates(paths):
+        return {
+            os.path.basename(key)
+            for key in manifest.dependents(paths)
+            if key.endswith((".conf", ".html"))
+        }
+
+    assert templates({"proxies[0].backend"}) == {"index.html", "httpd-ssl.conf"}
+    assert templates({"admin.email"}) == {
+        "httpd.conf",
+        "httpd-ssl.conf",
+        "httpd-git.conf",
+    }
+    assert templates({"admin"}) == templates({"admin.email", "admin.domain"})
+    assert manifest.dependency_index()["proxies"] == {
+        "build/webroot/index.html",
+        "build/apache/conf/extra/httpd-ssl.conf",
+    }
@@ -0,0 +1,86 @@
+"""
+Test the watch service
+"""
+
+import os
+import shutil
+from watchfiles import Change
+from configuration.app import Config, AdminContext, BuildContext, WORKSPACE
+from configuration.tree_walker import IncrementalTreeRenderer
+from services.config_service import ConfigService
+from services.watch_service import WatchService
+
+
+class StubHttpdService:
+    def __init__(self):
+        self.reloads = []
+
+    def get_container_id(self, name: str):
+        return "abc123"
+
+    def reload_configuration(self, container_id: str):
+        self.reloads.append(container_id)
+
+
+def watch_service(tmp_path):
+    template_root = tmp_path / "templates"
+    shutil.copytree(f"{WORKSPACE}/templates", template_root)
+    config = Config(
+        admin=AdminContext(domain="example.com", email="admin@example.com"),
+        build=BuildContext(
+            build_root=str(tmp_path / "build"), template_root=str(template_root)
+        ),
+    )
+    httpd_service = StubHttpdService()
+    service = WatchService(
+        ConfigService(config),
+        httpd_service,
+        config_path=str(tmp_path / "config.yaml"),
+    )
+    IncrementalTreeRenderer().walk(config.build_paths, config)
+    return service, httpd_service
+
+
+def test_template_change_rerenders_affected_nodes(tmp_path):
+    service, httpd_service = watch_service(tmp_path)
+    template = os.path.join(service.template_root(), "gitweb.conf")
+    with open(template, "a") as file:
+        file.write("\n# watched\n")
+
+    changed = service.handle_changes({(Change.modified, template)})
+    assert len(changed) == 1
+    assert changed[0].endswith("gitweb.conf")
+    assert httpd_service.reloads == ["abc123"]
+
+    # Unchanged output does not trigger a reload
+    assert service.handle_changes({(Change.modified, template)}) == []
+    assert httpd_service.reloads == ["abc123"]
+
+
+def test_config_change_rerenders_dependent_templates(tmp_path):
+    service, httpd_service = watch_service(tmp_path)
+    with open(service.config_path, "w") as file:
+        file.write("admin:\n  email: root@example.com\n")
+
+    changed = service.handle_changes({(Change.modified, service.config_path)})
+    assert sorted(os.path.basename(path) for path in changed) == [
+        "httpd-git.conf",
+        "httpd-ssl.conf",
+        "httpd.conf",
+    ]
+    assert httpd_service.reloads == ["abc123"]
+
+    with open(service.config_path, "a") as file:
+        file.write("proxies:\n  - url: /app\n    backend: http://localhost:8080\n")
+    changed = service.handle_changes({(Change.modified, service.config_path)})
+    assert sorted(os.path.basename(path) for path in changed) == [
+        "httpd-ssl.conf",
+        "index.html",
+    ]
+
+
+def test_unrelated_change_is_ignored(tmp_path):
+    service, httpd_service = watch_service(tmp_path)
+    assert not service.is_watched(Change.modified, str(tmp_path / "other.txt"))
+    assert service.handle_changes({(Change.modified, str(tmp_path / "x"))}) == []
+    assert httpd_service.reloads == []
@@ -0,0 +1,85 @@
+"""
+Test the websocket hub
+"""
+
+import asyncio
+import json
+import threading
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from web.ws_hub import HubClient, WebSocketHub
+
+
+def hub_client():
+    hub = WebSocketHub()
+    app = FastAPI()
+    app.websocket("/ws")(hub.serve)
+    return hub, TestClient(app)
+
+
+def wait_for_clients(hub: WebSocketHub, count: int):
+    for _ in range(200):
+        if len(hub.clients) == count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("clients did not connect")
+
+
+def test_publish_to_subscribed_clients():
+    hub, client = hub_client()
+    with client.websocket_connect("/ws") as config_ws, client.websocket_connect(
+        "/ws"
+    ) as render_ws:
+        render_ws.send_text(json.dumps({"subscribe": ["render"]}))
+        wait_for_clients(hub, 2)
+        # Wait for the subscription to be handled before publishing
+        for _ in range(200):
+            if any(c.topics == {"render"} for c in hub.clients):
+                break
+            threading.Event().wait(0.01)
+
+        hub.publish("config", {"version": 1, "paths": ["admin.domain"]})
+        hub.publish("render", {"changed": ["httpd.conf"]})
+
+        assert config_ws.receive_json() == {
+            "topic": "config",
+            "data": {"version": 1, "paths": ["admin.domain"]},
+        }
+        assert config_ws.receive_json()["topic"] == "render"
+        assert render_ws.receive_json() == {
+            "topic": "render",
+            "data": {"changed": ["httpd.conf"]},
+        }
+
+
+class StalledWebSocket:
+    client = "stalled"
+
+    def __init__(self):
+        self.closed_with = None
+
+    async def send_text(self, text):
+        await asyncio.Event().wait()
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def test_slow_clients_are_dropped():
+    async def scenario():
+        hub = WebSocketHub(queue_size=2)
+        hub.loop = asyncio.get_running_loop()
+        fast = HubClient(StalledWebSocket(), asyncio.Queue(10))
+        slow = HubClient(StalledWebSocket(), asyncio.Queue(2))
+        hub.clients = {fast, slow}
+
+        for i in range(3):
+            hub.publish("config", {"version": i})
+        await asyncio.sleep(0)
+
+        assert hub.clients == {fast}
+        assert fast.queue.qsize() == 3
+        assert slow.websocket.closed_with == 1013
+        assert hub.stats() == {"clients": 1, "dropped": 1}
+
+    asyncio.run(scenario())
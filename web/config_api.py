@@ -3,9 +3,13 @@ API for retrieving and updating the configuration object
 """
 
 import logging
-from fastapi import APIRouter, HTTPException
+import uuid
+from typing import Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from configuration.app import Config
-from services.config_service import ConfigService, merge_config
+from configuration.json_patch import JsonPatchError, JsonPatchTestFailed
+from services.config_service import ConfigService, ConfigVersionConflict
 from web.fastapi_provider import RouteProvider
 
 # Configure logging
@@ -19,15 +23,24 @@ class ConfigAPI(RouteProvider):
     """
 
     def __init__(self, config_service: ConfigService):
-        self.config = config_service.config
+        self.config_service = config_service
+        # Distinguishes the ETags of this process from those of earlier runs,
+        # whose configuration versions started from the same numbers
+        self.instance_id = uuid.uuid4().hex[:12]
+        # Serialized bodies and ETags of the current version, per field selection
+        self.bodies: Dict[Tuple[str, ...], Tuple[bytes, str]] = {}
+        self.bodies_version: Optional[int] = None
         self.config_router = APIRouter()
 
         # Register routes
         self.config_router.add_api_route(
-            "/config", self.get_configuration, methods=["GET"]
+            "/config",
+            self.get_configuration,
+            methods=["GET"],
+            response_model=Config,
         )
         self.config_router.add_api_route(
-            "/config", self.update_configuration, methods=["PATCH"]
+            "/config", self.update_configuration, methods=["PATCH"], response_model=None
         )
 
     def get_routes(self):
@@ -36,24 +49,131 @@ class ConfigAPI(RouteProvider):
         """
         return self.config_router
 
-    async def get_configuration(self) -> Config:
+    def etag(self, version: int, fields: Tuple[str, ...] = ()) -> str:
+        """The strong ETag of a configuration version and field selection"""
+        selection = ",".join(fields) if fields else "all"
+        return f'"{self.instance_id}-{version}-{selection}"'
+
+    def expected_version(self, if_match: str) -> int:
+        """
+        The configuration version an If-Match header was made against. It may
+        carry an ETag from GET /config or a quoted version number. Weak and
+        unrecognized tags yield -1, which matches no version.
+        """
+        tag = if_match.split(",")[0].strip()
+        if tag == "*":
+            return self.config_service.version
+        if not (tag.startswith('"') and tag.endswith('"')):
+            return -1
+        tag = tag[1:-1]
+        prefix = f"{self.instance_id}-"
+        if tag.startswith(prefix):
+            tag = tag[len(prefix) :].split("-", 1)[0]
+        return int(tag) if tag.isdigit() else -1
+
+    def serialized(self, fields: Tuple[str, ...]) -> Tuple[bytes, str]:
+        """
+        The JSON body and strong ETag of the current configuration, restricted to
+        fields if any are given. Each is serialized once per configuration version.
+        """
+        version, config = self.config_service.snapshot()
+        if version != self.bodies_version:
+            self.bodies = {}
+            self.bodies_version = version
+        cached = self.bodies.get(fields)
+        if cached is None:
+            include = set(fields) if fields else None
+            body = config.model_dump_json(include=include).encode()
+            cached = self.bodies[fields] = (body, self.etag(version, fields))
+        return cached
+
+    async def get_configuration(
+        self, request: Request, fields: Optional[str] = None
+    ) -> Response:
         """
         Retrieve the current API configuration
 
-        Returns the complete configuration object
+        Returns the complete configuration object, or only the comma separated
+        top level fields given in ?fields=. Answers 304 Not Modified when the
+        If-None-Match header carries the current ETag.
         """
-        return self.config
+        selected: Tuple[str, ...] = ()
+        if fields:
+            selected = tuple(sorted({name.strip() for name in fields.split(",")}))
+            unknown = [name for name in selected if name not in Config.model_fields]
+            if unknown:
+                raise HTTPException(
+                    status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+                )
+
+        body, etag = self.serialized(selected)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
 
-    async def update_configuration(self, new_config: dict) -> Config | None:
+    async def update_configuration(self, request: Request) -> Config | Response:
         """
         Update the API configuration
 
-        Allows partial or full configuration updates
+        Accepts one of:
+        - a JSON object, merged into the configuration (partial or full update)
+        - a JSON array of such objects, merged in order as one update
+        - a JSON Patch (RFC 6902), sent as application/json-patch+json
+
+        Batches and patches apply atomically and require an If-Match header with
+        the ETag (or quoted version) of the configuration they were made against:
+        428 if it is missing, 412 if the configuration has since changed. They
+        return the new version. If-Match is optional for a single object, which
+        returns the updated configuration.
         """
-        logger.info("Updating configuration with: %s", new_config)
         try:
-            updated_config = merge_config(self.config, new_config)
-            return updated_config
+            body = await request.json()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid JSON body") from e
+
+        content_type = request.headers.get("content-type", "")
+        is_patch = content_type.startswith("application/json-patch+json")
+        if_match = request.headers.get("if-match")
+        expected_version = None
+        if if_match is not None:
+            expected_version = self.expected_version(if_match)
+        elif is_patch or isinstance(body, list):
+            raise HTTPException(
+                status_code=428, detail="If-Match is required for batch updates"
+            )
+
+        logger.info("Updating configuration with: %s", body)
+        try:
+            if is_patch:
+                if not isinstance(body, list):
+                    raise JsonPatchError("A JSON Patch must be an array of operations")
+                snapshot = self.config_service.patch(body, expected_version)
+            elif isinstance(body, list):
+                snapshot = self.config_service.update_many(body, expected_version)
+            else:
+                return self.config_service.update(body, expected_version).config
+        except ConfigVersionConflict as e:
+            raise HTTPException(status_code=412, detail=str(e)) from e
+        except JsonPatchTestFailed as e:
+            raise HTTPException(status_code=409, detail=str(e)) from e
+        except JsonPatchError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
         except Exception as e:
             logger.error("Error updating configuration: %s", e)
             raise HTTPException(status_code=400, detail=str(e)) from e
+
+        return JSONResponse(
+            {"version": snapshot.version},
+            headers={"ETag": self.etag(snapshot.version)},
+        )
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag, using weak comparison"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
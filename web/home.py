@@ -4,60 +4,57 @@ Home page and WebSocket endpoint for enabling actions on the web
 
 import logging
 from contextlib import asynccontextmanager
-from fastapi.websockets import WebSocketState, WebSocketDisconnect, WebSocket
+from fastapi.websockets import WebSocketState, WebSocket
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
 from configuration.container import ServerContainer
 from actions.build import list_functions
+from services.config_service import ConfigChangeEvent
 
 # Initialize Jinja2 templates
 templates = Jinja2Templates(directory="templates")
 
 container = ServerContainer()
 app = container.app_provider().get_app()
-connected_websockets = set()
+hub = container.ws_hub()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def publish_config_change(event: ConfigChangeEvent):
+    """
+    Push a configuration change to the websocket clients subscribed to "config".
+    """
+    hub.publish("config", {"version": event.new.version, "paths": sorted(event.paths)})
+
+
+container.config_service().subscribe("", publish_config_change)
+
+
 @asynccontextmanager
-async def lifespan(app: FastAPI, websockets: set = connected_websockets):
+async def lifespan(app: FastAPI):
     """
     Context manager to handle the lifespan of the FastAPI application.
     """
     print("We starting up")
     yield
     print("Shutting down websockets")
-    for websocket in connected_websockets:
+    for client in list(hub.clients):
+        websocket = client.websocket
         print("Attempting to close websocket %s" % str(websocket.client))
-        if not websocket.client_state.name != WebSocketState.DISCONNECTED:
+        if websocket.client_state != WebSocketState.DISCONNECTED:
             await websocket.close()
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
-    WebSocket endpoint for retrieving and updating configuration.
+    WebSocket endpoint pushing configuration, render, reload and container events.
+    Clients may send {"subscribe": [topics]} to receive only some of them.
     """
-    await websocket.accept()
-    connected_websockets.add(websocket)
-    try:
-        while True:
-            data = await websocket.receive_text()
-            await websocket.send_text(f"Message text was: {data}")
-    except WebSocketDisconnect as e:
-        logger.info("Got a disconnect exception: %s", e)
-        return
-    except RuntimeError as e:
-        logger.error("Error processing websocket: %s", e)
-        connected_websockets.remove(websocket)
-        if not websocket.client_state != WebSocketState.DISCONNECTED:
-            try:
-                await websocket.close()
-            except RuntimeError as e:
-                logger.error("Error closing websocket: %s", e)
+    await hub.serve(websocket)
 
 
 @app.get("/")
@@ -0,0 +1,146 @@
+"""
+A publish/subscribe hub that pushes server events to websocket clients.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Messages queued per client before the client is considered too slow
+DEFAULT_QUEUE_SIZE = 100
+
+# Subscribes a client to every topic
+ALL_TOPICS = "*"
+
+# Close code sent to clients dropped for falling behind (try again later)
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+
+@dataclass(eq=False)
+class HubClient:
+    """A connected websocket, its outgoing queue and its topic subscriptions"""
+
+    websocket: WebSocket
+    queue: asyncio.Queue
+    topics: Set[str] = field(default_factory=lambda: {ALL_TOPICS})
+    sender: Optional[asyncio.Task] = None
+
+    def wants(self, topic: str) -> bool:
+        """Whether the client subscribed to topic"""
+        return ALL_TOPICS in self.topics or topic in self.topics
+
+
+class WebSocketHub:
+    """
+    Broadcasts events to websocket clients. Each event is serialized once and
+    queued for every subscribed client; a client whose queue is full is dropped
+    rather than slowing down the others. publish may be called from any thread.
+
+    Clients receive {"topic": ..., "data": ...} messages for every topic until
+    they send {"subscribe": [topics]}, and may send {"unsubscribe": [topics]}.
+    """
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.clients: Set[HubClient] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dropped = 0
+
+    async def serve(self, websocket: WebSocket):
+        """Accept a websocket and serve it until it disconnects"""
+        await websocket.accept()
+        self.loop = asyncio.get_running_loop()
+        client = HubClient(websocket, asyncio.Queue(self.queue_size))
+        client.sender = asyncio.create_task(self.send_messages(client))
+        self.clients.add(client)
+        try:
+            while True:
+                self.handle_message(client, await websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+        except RuntimeError as e:
+            logger.error("Error processing websocket: %s", e)
+        finally:
+            self.clients.discard(client)
+            client.sender.cancel()
+
+    async def send_messages(self, client: HubClient):
+        """Forward a client's queued messages to its websocket"""
+        try:
+            while True:
+                await client.websocket.send_text(await client.queue.get())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info("Stopped sending to websocket: %s", e)
+            self.clients.discard(client)
+
+    def handle_message(self, client: HubClient, text: str):
+        """Update a client's subscriptions from a message it sent"""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            logger.info("Ignoring websocket message: %s", text)
+            return
+        if not isinstance(message, dict):
+            return
+        if "subscribe" in message:
+            client.topics = set(message["subscribe"])
+        if "unsubscribe" in message:
+            client.topics -= set(message["unsubscribe"])
+
+    def publish(self, topic: str, data: Any):
+        """Broadcast data to the clients subscribed to topic"""
+        loop = self.loop
+        if loop is None or loop.is_closed() or not self.clients:
+            return
+        text = json.dumps({"topic": topic, "data": data}, default=str)
+        if self.running_in(loop):
+            self.broadcast(topic, text)
+        else:
+            loop.call_soon_threadsafe(self.broadcast, topic, text)
+
+    @staticmethod
+    def running_in(loop: asyncio.AbstractEventLoop) -> bool:
+        """Whether the calling thread is running loop"""
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    def broadcast(self, topic: str, text: str):
+        """Queue a serialized message for each subscribed client, on the loop"""
+        for client in list(self.clients):
+            if not client.wants(topic):
+                continue
+            try:
+                client.queue.put_nowait(text)
+            except asyncio.QueueFull:
+                self.drop(client)
+
+    def drop(self, client: HubClient):
+        """Disconnect a client that is not keeping up with its messages"""
+        logger.warning("Dropping slow websocket client %s", client.websocket.client)
+        self.clients.discard(client)
+        self.dropped += 1
+        if client.sender is not None:
+            client.sender.cancel()
+        asyncio.ensure_future(self.close(client.websocket))
+
+    @staticmethod
+    async def close(websocket: WebSocket):
+        """Close a websocket, ignoring errors from one that is already closed"""
+        try:
+            await websocket.close(code=SLOW_CLIENT_CLOSE_CODE)
+        except RuntimeError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """The number of connected and dropped clients"""
+        return {"clients": len(self.clients), "dropped": self.dropped}